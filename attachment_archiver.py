@@ -0,0 +1,275 @@
+"""
+Attachment Archiver
+Downloads message attachments in the background and stores each file once by content hash
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import aiohttp
+
+DEFAULT_MAX_BYTES = 25 * 1024 * 1024  # Discord's default upload limit
+DEFAULT_ALLOWED_TYPES = ("image/", "video/", "audio/", "text/", "application/pdf")
+CHUNK_SIZE = 64 * 1024
+
+
+class AttachmentTooLarge(Exception):
+    """Raised when a download grows past the configured size limit"""
+
+
+def file_sha256(path: Path) -> str:
+    """Hash a file in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AttachmentArchiver:
+    """Background download queue with a shared connection pool
+
+    Submitted jobs are recorded in pending.jsonl until they finish, so jobs and
+    their partial files interrupted by a restart are resumed by the next start().
+    """
+
+    def __init__(
+        self,
+        folder: Path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        allowed_types: Optional[Sequence[str]] = DEFAULT_ALLOWED_TYPES,
+        workers: int = 4,
+        connections: int = 8,
+        queue_size: int = 1000,
+        retries: int = 3
+    ):
+        self.folder = Path(folder)
+        self.objects = self.folder / "objects"
+        self.partial = self.folder / "partial"
+        self.manifest_file = self.folder / "manifest.jsonl"
+        self.pending_file = self.folder / "pending.jsonl"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.partial.mkdir(parents=True, exist_ok=True)
+
+        self.max_bytes = max_bytes
+        self.allowed_types = tuple(allowed_types) if allowed_types else None
+        self.workers = workers
+        self.connections = connections
+        self.queue_size = queue_size
+        self.retries = retries
+
+        # attachment id -> archived file info
+        self.manifest: Dict[str, Dict] = self.load_manifest()
+        self.queued = set()
+        self.queue: Optional[asyncio.Queue] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.tasks = []
+        self.stats = {"archived": 0, "deduplicated": 0, "skipped": 0, "failed": 0}
+
+    def load_manifest(self) -> Dict[str, Dict]:
+        """Read the append-only manifest"""
+        manifest = {}
+        if self.manifest_file.exists():
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        manifest[entry["attachment_id"]] = entry
+        return manifest
+
+    def load_pending(self) -> List[Dict]:
+        """Jobs submitted in an earlier run that never finished"""
+        jobs = {}
+        if self.pending_file.exists():
+            with open(self.pending_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Cut short by a crash
+                        continue
+                    if entry.get("done"):
+                        jobs.pop(entry["attachment_id"], None)
+                    else:
+                        jobs[entry["attachment_id"]] = entry
+        return [job for attachment_id, job in jobs.items() if attachment_id not in self.manifest]
+
+    def write_pending(self, jobs: List[Dict]):
+        """Replace the pending log with just the unfinished jobs"""
+        tmp_file = self.pending_file.with_suffix(".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for job in jobs:
+                f.write(json.dumps(job, ensure_ascii=False) + "\n")
+        os.replace(tmp_file, self.pending_file)
+
+    def log_pending(self, entry: Dict):
+        with open(self.pending_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def object_path(self, sha256: str) -> Path:
+        """Content-addressed location of a stored file"""
+        return self.objects / sha256[:2] / sha256
+
+    def accepts(self, attachment) -> bool:
+        """Check size and type limits before queueing"""
+        if attachment.size and attachment.size > self.max_bytes:
+            return False
+        if self.allowed_types is not None:
+            content_type = attachment.content_type or ""
+            if not content_type.startswith(self.allowed_types):
+                return False
+        return True
+
+    def submit(self, attachment) -> bool:
+        """Queue an attachment for download without waiting for it"""
+        attachment_id = str(attachment.id)
+        if attachment_id in self.manifest or attachment_id in self.queued:
+            return True
+
+        if self.queue is None or not self.accepts(attachment) or self.queue.full():
+            self.stats["skipped"] += 1
+            return False
+
+        job = {
+            "attachment_id": attachment_id,
+            "url": attachment.url,
+            "filename": attachment.filename,
+            "content_type": attachment.content_type
+        }
+        self.log_pending(job)
+        self.queued.add(attachment_id)
+        self.queue.put_nowait(job)
+        return True
+
+    def finish(self, job: Dict):
+        """Forget a job that will not be tried again, with whatever it downloaded"""
+        (self.partial / f"{job['attachment_id']}.part").unlink(missing_ok=True)
+        self.log_pending({"attachment_id": job["attachment_id"], "done": True})
+
+    async def start(self):
+        """Open the connection pool and start workers (safe to call on every reconnect)"""
+        if self.session is not None:
+            return
+
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.connections),
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=60)
+        )
+
+        # Resume jobs from an earlier run; what does not fit waits for the next start
+        jobs = self.load_pending()
+        self.write_pending(jobs)
+        resumable = {f"{job['attachment_id']}.part" for job in jobs}
+        for part_file in self.partial.glob("*.part"):
+            if part_file.name not in resumable:
+                part_file.unlink()
+        for job in jobs[:self.queue_size]:
+            self.queued.add(job["attachment_id"])
+            self.queue.put_nowait(job)
+        if jobs:
+            print(f"📎 Resuming {min(len(jobs), self.queue_size)} attachment downloads")
+
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        """Stop workers and close the connection pool"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def worker(self):
+        """Download queued attachments one at a time"""
+        while True:
+            job = await self.queue.get()
+            # Cancellation (close()) skips finish(), so the job resumes after a restart
+            try:
+                await self.archive(job)
+                self.finish(job)
+            except AttachmentTooLarge:
+                self.stats["skipped"] += 1
+                self.finish(job)
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"❌ Error archiving attachment {job['filename']}: {e}")
+                self.finish(job)
+            finally:
+                self.queued.discard(job["attachment_id"])
+                self.queue.task_done()
+
+    async def archive(self, job: Dict):
+        """Download one attachment, then move it into content-addressed storage"""
+        part_file = self.partial / f"{job['attachment_id']}.part"
+
+        for attempt in range(self.retries):
+            try:
+                await self.download(job["url"], part_file)
+                break
+            except aiohttp.ClientResponseError as e:
+                # Expired or removed URLs will not come back
+                if 400 <= e.status < 500 and e.status not in (408, 429) or attempt == self.retries - 1:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries - 1:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+        loop = asyncio.get_running_loop()
+        sha256 = await loop.run_in_executor(None, file_sha256, part_file)
+        size = part_file.stat().st_size
+
+        target = self.object_path(sha256)
+        if target.exists():
+            part_file.unlink()
+            self.stats["deduplicated"] += 1
+        else:
+            target.parent.mkdir(exist_ok=True)
+            os.replace(part_file, target)
+            self.stats["archived"] += 1
+
+        entry = {
+            "attachment_id": job["attachment_id"],
+            "sha256": sha256,
+            "size": size,
+            "filename": job["filename"],
+            "content_type": job["content_type"],
+            "archived_at": datetime.now().isoformat()
+        }
+        self.manifest[job["attachment_id"]] = entry
+        with open(self.manifest_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    async def download(self, url: str, part_file: Path):
+        """Download into a partial file, resuming where a previous attempt stopped"""
+        offset = part_file.stat().st_size if part_file.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        async with self.session.get(url, headers=headers) as response:
+            if response.status == 416:
+                # The partial file already holds the whole attachment
+                return
+            if offset and response.status == 200:
+                # Server ignored the range request, start over
+                offset = 0
+            elif response.status not in (200, 206):
+                response.raise_for_status()
+
+            mode = 'ab' if offset else 'wb'
+            written = offset
+            with open(part_file, mode) as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > self.max_bytes:
+                        raise AttachmentTooLarge(url)
+                    f.write(chunk)
@@ -0,0 +1,224 @@
+"""
+Incremental Backups
+Compressed full and differential guild backups with checksums, retention and restore
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from serializers import Serializer, get_serializer
+
+
+class BackupCorrupted(Exception):
+    """Raised when a backup file does not match its recorded checksum"""
+
+
+def record_digest(record: Dict) -> str:
+    """Stable hash of a single record"""
+    encoded = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def file_sha256(path: Path) -> str:
+    """Checksum of a backup file as stored on disk"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class BackupManager:
+    """Writes full backups plus differentials against the latest full backup"""
+
+    def __init__(self, folder: Path, key: str = "id", full_every: int = 24,
+                 serializer: Optional[Serializer] = None):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.manifest_file = self.folder / "manifest.json"
+        self.key = key
+        self.full_every = full_every  # Differentials before the next full backup
+        self.serializer = serializer or get_serializer()
+
+        # guild_id -> list of backup entries, oldest first
+        self.manifest: Dict[str, List[Dict]] = {}
+        if self.manifest_file.exists():
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+        # guild_id -> {"signature": (file, size, mtime), "digests": {record key -> digest}}
+        # for the latest full backup
+        self.bases: Dict[str, Dict] = {}
+
+    def entries(self, guild_id) -> List[Dict]:
+        return self.manifest.setdefault(str(guild_id), [])
+
+    def latest_full(self, guild_id) -> Optional[Dict]:
+        for entry in reversed(self.entries(guild_id)):
+            if entry["kind"] == "full":
+                return entry
+        return None
+
+    def save_manifest(self):
+        tmp_file = self.manifest_file.with_suffix(".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+
+    def write_file(self, filename: str, payload: Dict) -> str:
+        """Write a compressed backup file and return its checksum"""
+        path = self.folder / filename
+        with gzip.open(path, 'wb') as f:
+            f.write(self.serializer.dumps(payload))
+        return file_sha256(path)
+
+    def read_file(self, entry: Dict) -> Dict:
+        """Read a backup file after verifying its checksum"""
+        if not self.verify(entry):
+            raise BackupCorrupted(entry["file"])
+        with gzip.open(self.folder / entry["file"], 'rb') as f:
+            return self.serializer.loads(f.read())
+
+    def verify(self, entry: Dict) -> bool:
+        path = self.folder / entry["file"]
+        return path.exists() and file_sha256(path) == entry["sha256"]
+
+    def verify_all(self) -> List[str]:
+        """Return the names of all backup files that fail verification"""
+        return [entry["file"] for entries in self.manifest.values()
+                for entry in entries if not self.verify(entry)]
+
+    def base_digests(self, guild_id, full_entry: Dict) -> Dict:
+        """Per-record digests of the latest full backup, loaded once while the file is untouched"""
+        path = self.folder / full_entry["file"]
+        stat = path.stat()
+        signature = (full_entry["file"], stat.st_size, stat.st_mtime_ns)
+
+        base = self.bases.get(str(guild_id))
+        if base is None or base["signature"] != signature:
+            records = self.read_file(full_entry)["records"]
+            base = {
+                "signature": signature,
+                "digests": {str(r[self.key]): record_digest(r) for r in records}
+            }
+            self.bases[str(guild_id)] = base
+        return base["digests"]
+
+    def backup(self, guild_id, records: List[Dict], now: Optional[datetime] = None) -> Optional[Dict]:
+        """Back up a guild's records, or return None if nothing changed"""
+        now = now or datetime.now()
+        entries = self.entries(guild_id)
+
+        digests = {str(r[self.key]): record_digest(r) for r in records}
+        data_digest = hashlib.sha256("".join(digests.values()).encode('utf-8')).hexdigest()
+        # Unchanged, unless the backup holding this data has gone missing
+        if entries and entries[-1]["data_digest"] == data_digest and (self.folder / entries[-1]["file"]).exists():
+            return None
+
+        full_entry = self.latest_full(guild_id)
+        diffs_since_full = len(entries) - 1 - entries.index(full_entry) if full_entry else 0
+        stamp = now.strftime("%Y%m%d_%H%M%S")
+
+        entry = {"created": now.isoformat(), "data_digest": data_digest, "records": len(records)}
+
+        base = None
+        if full_entry is not None and diffs_since_full < self.full_every:
+            try:
+                base = self.base_digests(guild_id, full_entry)
+            except (BackupCorrupted, OSError) as e:
+                # A differential against it could never be restored, so start a new chain
+                print(f"⚠️ Full backup {full_entry['file']} is unreadable, writing a new one: {e}")
+
+        if base is not None:
+            upserts = [r for r in records if base.get(str(r[self.key])) != digests[str(r[self.key])]]
+            removed = [k for k in base if k not in digests]
+
+            # A differential that rewrites most records is no cheaper than a full backup
+            if len(upserts) <= len(records) // 2:
+                entry.update(kind="diff", base=full_entry["file"], file=f"{guild_id}_{stamp}_diff.json.gz")
+                entry["sha256"] = self.write_file(entry["file"], {"upserts": upserts, "removed": removed})
+                entries.append(entry)
+                self.save_manifest()
+                return entry
+
+        entry.update(kind="full", file=f"{guild_id}_{stamp}_full.json.gz")
+        entry["sha256"] = self.write_file(entry["file"], {"records": records})
+        stat = (self.folder / entry["file"]).stat()
+        self.bases[str(guild_id)] = {
+            "signature": (entry["file"], stat.st_size, stat.st_mtime_ns),
+            "digests": digests
+        }
+        entries.append(entry)
+        self.save_manifest()
+        return entry
+
+    def restore(self, guild_id, at: Optional[datetime] = None) -> List[Dict]:
+        """Rebuild a guild's records from the last full backup plus its latest differential"""
+        entries = self.entries(guild_id)
+        if at is not None:
+            entries = [e for e in entries if datetime.fromisoformat(e["created"]) <= at]
+        if not entries:
+            return []
+
+        target = entries[-1]
+        if target["kind"] == "full":
+            return self.read_file(target)["records"]
+
+        base_entry = next(e for e in entries if e["file"] == target["base"])
+        records = self.read_file(base_entry)["records"]
+        diff = self.read_file(target)
+
+        # Each differential holds every change since its full backup
+        removed = set(diff["removed"])
+        upserts = {str(r[self.key]): r for r in diff["upserts"]}
+        restored = []
+        for record in records:
+            key = str(record[self.key])
+            if key not in removed:
+                restored.append(upserts.pop(key, record))
+        restored.extend(upserts.values())
+        return restored
+
+    def apply_retention(self, guild_id, now: Optional[datetime] = None,
+                        hourly_for: timedelta = timedelta(days=1),
+                        daily_for: timedelta = timedelta(days=30)) -> List[str]:
+        """Keep hourly backups for a day, daily for a month and monthly forever"""
+        now = now or datetime.now()
+        entries = self.entries(guild_id)
+        if not entries:
+            return []
+
+        # The newest backup in each bucket survives
+        buckets = {}
+        for entry in entries:
+            created = datetime.fromisoformat(entry["created"])
+            age = now - created
+            if age <= hourly_for:
+                bucket = ("hour", created.strftime("%Y%m%d%H"))
+            elif age <= daily_for:
+                bucket = ("day", created.strftime("%Y%m%d"))
+            else:
+                bucket = ("month", created.strftime("%Y%m"))
+            buckets[bucket] = entry["file"]
+
+        keep = set(buckets.values())
+        keep.add(entries[-1]["file"])
+        latest_full = self.latest_full(guild_id)
+        if latest_full is not None:
+            keep.add(latest_full["file"])
+
+        # Differentials are useless without their full backup
+        keep.update(e["base"] for e in entries if e["file"] in keep and e["kind"] == "diff")
+
+        removed = []
+        for entry in entries:
+            if entry["file"] not in keep:
+                (self.folder / entry["file"]).unlink(missing_ok=True)
+                removed.append(entry["file"])
+
+        if removed:
+            self.manifest[str(guild_id)] = [e for e in entries if e["file"] in keep]
+            self.save_manifest()
+        return removed
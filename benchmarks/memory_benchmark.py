@@ -0,0 +1,143 @@
+"""
+Memory Benchmark
+Resident memory of the gateway caches with and without LOW_MEMORY_MODE
+
+Each run happens in a fresh process that feeds synthetic GUILD_CREATE and
+MESSAGE_CREATE payloads into a client's connection state, the same way the
+gateway would, then reports how much RSS grew.
+
+Usage: python benchmarks/memory_benchmark.py [--members 500] [--messages 5000]
+"""
+
+import argparse
+import asyncio
+import gc
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+GUILD_COUNTS = (10, 100, 1000)
+CHANNELS_PER_GUILD = 20
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB"""
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    # Peak instead of current, but good enough where /proc is missing
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def user_payload(user_id: int) -> dict:
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0",
+            "global_name": None, "avatar": None}
+
+
+def guild_payload(guild_id: int, members: int) -> dict:
+    """A GUILD_CREATE payload after member chunking has completed"""
+    return {
+        "id": str(guild_id),
+        "name": f"Guild {guild_id}",
+        "owner_id": "1",
+        "member_count": members,
+        "large": members > 250,
+        "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0,
+                   "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [
+            {"id": str(guild_id * 100 + c), "type": 0, "name": f"channel-{c}", "position": c,
+             "permission_overwrites": [], "guild_id": str(guild_id)}
+            for c in range(CHANNELS_PER_GUILD)
+        ],
+        "members": [
+            {"user": user_payload(guild_id * 100000 + m), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00",
+             "deaf": False, "mute": False, "flags": 0}
+            for m in range(members)
+        ],
+        "emojis": [], "stickers": [], "threads": [], "voice_states": [], "presences": [],
+    }
+
+
+def message_payload(message_id: int, guild_id: int) -> dict:
+    author = guild_id * 100000 + message_id % 50
+    return {
+        "id": str(message_id),
+        "channel_id": str(guild_id * 100 + message_id % CHANNELS_PER_GUILD),
+        "guild_id": str(guild_id),
+        "author": user_payload(author),
+        "member": {"roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0},
+        "content": "hello world " * 10,
+        "timestamp": "2025-01-01T00:00:00+00:00",
+        "edited_timestamp": None, "tts": False, "mention_everyone": False, "mentions": [],
+        "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0,
+    }
+
+
+async def measure(guilds: int, members: int, messages: int, low_memory: bool) -> float:
+    import discord
+    from memory_budget import client_options
+
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = True
+    intents.guilds = True
+
+    client = discord.Client(**client_options(intents, low_memory, max_messages=None))
+    state = client._connection
+
+    gc.collect()
+    before = rss_mb()
+
+    for g in range(1, guilds + 1):
+        state._add_guild_from_data(guild_payload(g, members))
+    for m in range(messages):
+        state.parse_message_create(message_payload(10 ** 6 + m, 1 + m % guilds))
+
+    gc.collect()
+    return rss_mb() - before
+
+
+def child(args):
+    grown = asyncio.run(measure(args.guilds, args.members, args.messages, args.low_memory))
+    print(f"{grown:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure gateway cache memory")
+    parser.add_argument("--members", type=int, default=500, help="Members per guild")
+    parser.add_argument("--messages", type=int, default=5000, help="Messages received")
+    parser.add_argument("--guilds", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--low-memory", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    print(f"📊 RSS growth with {args.members} members/guild and {args.messages} messages")
+    print(f"{'guilds':>7} {'default (MB)':>14} {'low memory (MB)':>16}")
+
+    for guilds in GUILD_COUNTS:
+        results = []
+        for low_memory in (False, True):
+            command = [sys.executable, __file__, "--child", "--guilds", str(guilds),
+                       "--members", str(args.members), "--messages", str(args.messages)]
+            if low_memory:
+                command.append("--low-memory")
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            results.append(float(output.strip().splitlines()[-1]))
+        print(f"{guilds:>7} {results[0]:>14.1f} {results[1]:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
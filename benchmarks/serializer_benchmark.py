@@ -0,0 +1,74 @@
+"""
+Serializer Benchmark
+Throughput and file size of each JSON backend on realistic message records
+
+Usage: python benchmarks/serializer_benchmark.py [message_count]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from serializers import available_backends, get_serializer
+
+WORDS = "the a bot server reply thanks message channel data export ok lol 👍 café über".split()
+
+
+def make_server_data(count: int) -> dict:
+    """Build a multi-server style guild dump with replies and attachments"""
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+    messages = {}
+
+    for i in range(count):
+        message_id = 1200000000000000000 + i * 4194304
+        sent = start + timedelta(minutes=i * 7)
+        messages[message_id] = {
+            "message_id": message_id,
+            "author": "you#0001",
+            "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 60))),
+            "timestamp": sent.isoformat(),
+            "channel_id": 900000000000000000 + rng.randint(0, 20),
+            "channel_name": f"channel-{rng.randint(0, 20)}",
+            "replies": [
+                {
+                    "replier": f"user{rng.randint(0, 500)}#1234",
+                    "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 30))),
+                    "timestamp": (sent + timedelta(seconds=rng.randint(5, 86400))).isoformat()
+                }
+                for _ in range(rng.choice((0, 0, 1, 2, 5)))
+            ],
+            "attachments": [f"https://cdn.discordapp.com/attachments/{i}/file.png"] if i % 10 == 0 else []
+        }
+
+    return {"guild_name": "Benchmark Guild", "messages": messages, "tracked_since": start.isoformat()}
+
+
+def bench(serializer, data, repeat: int = 5):
+    """Return (best seconds per encode, encoded size)"""
+    best = float("inf")
+    encoded = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encoded = serializer.dumps(data)
+        best = min(best, time.perf_counter() - started)
+    return best, len(encoded)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = make_server_data(count)
+
+    print(f"📊 Encoding {count} messages")
+    print(f"{'backend':<10} {'mode':<8} {'MB/s':>8} {'msgs/s':>12} {'size (KB)':>10}")
+
+    for backend in available_backends():
+        for pretty in (False, True):
+            seconds, size = bench(get_serializer(backend, pretty=pretty), data)
+            mode = "pretty" if pretty else "compact"
+            print(f"{backend:<10} {mode:<8} {size / seconds / 1e6:>8.1f} "
+                  f"{count / seconds:>12,.0f} {size / 1024:>10,.0f}")
@@ -6,18 +6,38 @@ Modern Discord bot with interactive features
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
 import csv
 import asyncio
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
+
+from attachment_archiver import AttachmentArchiver
+from backups import BackupCorrupted, BackupManager
+from edit_tracker import EditTracker
+from event_sinks import create_sink, message_event
+from export_cache import ExportCache, write_atomic
+from ingestion import parse_message
+from memory_budget import client_options
+from message_index import MessageIndex, parse_when
+from reply_analytics import ReplyStatsCache, format_latency_lines
+from rest_scheduler import request_scheduler
+from serializers import get_serializer
+from snapshots import CowStore
+from startup import ReadyTimer, TaskSupervisor, sync_commands
 
 # Configuration
 TOKEN = "YOUR_BOT_TOKEN_HERE"
 YOUR_USER_ID = "discord_user_id_here"  # Your Discord ID
 DATA_FOLDER = Path("commands_bot_data")
 DATA_FOLDER.mkdir(exist_ok=True)
+ARCHIVE_ATTACHMENTS = False  # Download attachments before their URLs expire
+JSON_BACKEND = None  # "orjson", "msgspec", "stdlib" or None for the fastest installed
+PRETTY_JSON = False  # Indented files are easier to read but larger and slower
+SYNC_GUILD_ID = None  # Set to a test server ID to sync slash commands there instantly
+LOW_MEMORY_MODE = False  # Skip member/message caches and unused intents (large servers)
+TRACK_REVISIONS = False  # Keep earlier versions of edited messages
+EVENT_SINK = None  # Stream events: "file", "unix:/path/to.sock" or "redis://localhost:6379/stream"
 
 # Bot setup
 intents = discord.Intents.default()
@@ -25,7 +45,19 @@ intents.message_content = True
 intents.members = True
 intents.guilds = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+
+class CommandsBot(commands.Bot):
+    """Bot that stops its background work before disconnecting"""
+
+    async def close(self):
+        await shutdown()
+        await super().close()
+
+
+bot = CommandsBot(command_prefix="!", http_trace=request_scheduler.trace_config(),
+                  **client_options(intents, LOW_MEMORY_MODE))
+serializer = get_serializer(JSON_BACKEND, pretty=PRETTY_JSON)
+event_sink = create_sink(EVENT_SINK, DATA_FOLDER)
 
 # Global data storage
 collected_data = {}
@@ -40,6 +72,8 @@ class DataCollector:
     def __init__(self):
         self.data = {}
         self.rate_limits = {}
+        self.index = MessageIndex()
+        self.versions = {}
     
     def check_rate_limit(self, user_id: int, action: str, limit: int = 5, window: int = 60) -> bool:
         """Check if user is rate limited for an action"""
@@ -58,25 +92,100 @@ class DataCollector:
         
         self.rate_limits[key].append(now)
         return True
+    
+    def version(self, guild_id: int) -> int:
+        """Counter that changes whenever a guild's data does"""
+        return self.versions.get(guild_id, 0)
+    
+    def touch(self, guild_id: int):
+        """Record a write to a guild's data"""
+        self.versions[guild_id] = self.versions.get(guild_id, 0) + 1
+    
+    def find_message(self, guild_id: Optional[int], message_id: int) -> Optional[dict]:
+        """Find a tracked message by id, ready to be changed"""
+        store = self.data.get(guild_id or 0)
+        return store.writable(message_id) if store is not None else None
+    
+    def select(self, guild_id: int, since: Optional[datetime] = None,
+               until: Optional[datetime] = None, channel: Optional[str] = None) -> List[dict]:
+        """Point-in-time copy of a guild's messages, optionally limited to a time range and channel
+        
+        Later writes never change the returned records, so they can be exported off the event loop.
+        """
+        store = self.data.get(guild_id)
+        if not store:
+            return []
+        
+        snapshot = store.snapshot()
+        if since is None and until is None and channel is None:
+            return list(snapshot.values())
+        return [snapshot[message_id] for message_id in self.index.range(guild_id, since, until, channel)]
+    
+    def count(self, guild_id: int, since: Optional[datetime] = None,
+              until: Optional[datetime] = None, channel: Optional[str] = None) -> int:
+        """How many messages select() would return, without copying or snapshotting anything"""
+        store = self.data.get(guild_id)
+        if not store:
+            return 0
+        if since is None and until is None and channel is None:
+            return len(store)
+        return self.index.count(guild_id, since, until, channel)
+
+def parse_range(since: Optional[str], until: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Parse since/until options, raises ValueError on bad dates"""
+    return (
+        parse_when(since) if since else None,
+        parse_when(until, end_of_day=True) if until else None
+    )
 
 data_collector = DataCollector()
+attachment_archiver = AttachmentArchiver(DATA_FOLDER / "attachments") if ARCHIVE_ATTACHMENTS else None
+reply_stats_cache = ReplyStatsCache()
+backup_manager = BackupManager(DATA_FOLDER / "backups", serializer=get_serializer(JSON_BACKEND))
+edit_tracker = EditTracker(lambda guild_id: data_collector.data.get(guild_id or 0), keep_revisions=TRACK_REVISIONS)
+export_cache = ExportCache(DATA_FOLDER / "exports")
+task_supervisor = TaskSupervisor()
+ready_timer = ReadyTimer()
 
-@bot.event
-async def on_ready():
-    """Bot startup handler"""
-    print(f'✅ Logged in as {bot.user}')
-    
-    # Sync slash commands
+async def shutdown():
+    """Close downloads and connections held by background work"""
+    if event_sink:
+        await event_sink.close()
+    if attachment_archiver:
+        await attachment_archiver.close()
+
+async def sync_slash_commands(client: commands.Bot):
+    """Sync slash commands unless they are unchanged since the last sync"""
     try:
-        synced = await bot.tree.sync()
-        print(f'✅ Synced {len(synced)} slash commands')
+        synced = await sync_commands(client.tree, DATA_FOLDER / "command_sync.json", guild_id=SYNC_GUILD_ID)
+        if synced is None:
+            print('✅ Slash commands unchanged, skipped sync')
+        else:
+            print(f'✅ Synced {synced} slash commands')
     except Exception as e:
         print(f'❌ Error syncing commands: {e}')
-    
+
+@bot.event
+async def setup_hook():
+    """Runs once per process, unlike on_ready which fires again on every reconnect"""
+    await sync_slash_commands(bot)
+
+@bot.event
+async def on_ready():
+    """Bot startup handler"""
+    print(f'✅ Logged in as {bot.user} (ready in {ready_timer.mark_ready():.2f}s)')
     print(f'🌍 Connected to {len(bot.guilds)} servers')
     
     # Start background tasks
-    bot.loop.create_task(periodic_backup())
+    task_supervisor.ensure("periodic_backup", periodic_backup)
+    if event_sink:
+        event_sink.start()
+    if attachment_archiver:
+        await attachment_archiver.start()
+
+@bot.event
+async def on_disconnect():
+    ready_timer.mark_disconnect()
 
 @bot.event
 async def on_message(message):
@@ -87,33 +196,91 @@ async def on_message(message):
     # Basic tracking
     if message.author.id == YOUR_USER_ID:
         await track_message(message)
+    elif message.reference:
+        await track_reply(message)
     
     # Process traditional commands
     await bot.process_commands(message)
 
-async def track_message(message):
+@bot.event
+async def on_raw_message_edit(payload):
+    """Update tracked messages and replies when they are edited"""
+    if edit_tracker.apply_edit(payload) is not None:
+        data_collector.touch(payload.guild_id or 0)
+
+@bot.event
+async def on_raw_message_delete(payload):
+    """Mark tracked messages and replies as deleted"""
+    if edit_tracker.apply_delete(payload):
+        data_collector.touch(payload.guild_id or 0)
+
+@bot.event
+async def on_raw_bulk_message_delete(payload):
+    """Mark tracked messages removed by a purge as deleted"""
+    deleted = edit_tracker.apply_bulk_delete(payload)
+    if deleted:
+        data_collector.touch(payload.guild_id or 0)
+        print(f"🗑️ [{payload.guild_id}] {deleted} tracked messages were purged")
+
+async def track_message(message, parsed=None):
     """Track a message with metadata"""
-    guild_id = message.guild.id if message.guild else 0
+    parsed = parsed or parse_message(message)
+    guild_id = parsed["guild_id"]
     
     if guild_id not in data_collector.data:
-        data_collector.data[guild_id] = []
+        data_collector.data[guild_id] = CowStore()
     
     message_data = {
-        "id": message.id,
-        "author": str(message.author),
-        "content": message.content,
-        "timestamp": message.created_at.isoformat(),
-        "channel": message.channel.name if hasattr(message.channel, 'name') else "DM",
-        "guild": message.guild.name if message.guild else "Direct Message",
-        "attachments": len(message.attachments),
-        "embeds": len(message.embeds)
+        "id": parsed["id"],
+        "author": parsed["author"],
+        "content": parsed["content"],
+        "timestamp": parsed["timestamp"],
+        "channel": parsed["channel"],
+        "guild": parsed["guild"],
+        "attachments": len(parsed["attachment_ids"]),
+        "attachment_ids": parsed["attachment_ids"],
+        "embeds": parsed["embeds"],
+        "replies": []
     }
     
-    data_collector.data[guild_id].append(message_data)
+    # Backfills see messages that are already tracked
+    if not data_collector.index.add(guild_id, message_data):
+        return
+    
+    data_collector.data[guild_id][parsed["id"]] = message_data
+    data_collector.touch(guild_id)
+    if event_sink:
+        event_sink.publish(message_event("message", parsed))
+    
+    # Downloads happen in the archiver's own queue
+    if attachment_archiver:
+        for att in message.attachments:
+            attachment_archiver.submit(att)
     
     # Limit stored messages to 1000 per guild
-    if len(data_collector.data[guild_id]) > 1000:
-        data_collector.data[guild_id] = data_collector.data[guild_id][-1000:]
+    dropped = data_collector.data[guild_id].trim(1000)
+    for old in dropped:
+        data_collector.index.remove(guild_id, old["id"])
+    edit_tracker.forget(dropped)
+
+async def track_reply(message, parsed=None):
+    """Track a reply to one of your tracked messages"""
+    parsed = parsed or parse_message(message)
+    original = data_collector.find_message(parsed["guild_id"], parsed["reference_id"])
+    if original is None:
+        return
+    
+    reply_data = {
+        "id": parsed["id"],
+        "replier": parsed["author"],
+        "content": parsed["content"],
+        "timestamp": parsed["timestamp"]
+    }
+    original.setdefault("replies", []).append(reply_data)
+    data_collector.touch(parsed["guild_id"])
+    edit_tracker.index_reply(original["id"], reply_data)
+    if event_sink:
+        event_sink.publish(message_event("reply", parsed))
 
 # ========================
 # SLASH COMMANDS
@@ -144,14 +311,11 @@ async def collect_command(
     collected = 0
     
     try:
-        async for message in target_channel.history(limit=limit):
+        # Pages are fetched as backfill, so other commands are answered first
+        async for message in request_scheduler.history(target_channel, limit):
             if message.author.id == YOUR_USER_ID:
                 await track_message(message)
                 collected += 1
-            
-            # Small delay to respect rate limits
-            if collected % 20 == 0:
-                await asyncio.sleep(0.1)
         
         await interaction.followup.send(
             f"✅ Collected {collected} of your messages from {target_channel.mention}"
@@ -165,12 +329,18 @@ async def collect_command(
 @bot.tree.command(name="export", description="Export collected data")
 @app_commands.describe(
     format="Export format",
-    include_replies="Include replies to your messages"
+    include_replies="Include replies to your messages",
+    since="Only messages from this date on (YYYY-MM-DD)",
+    until="Only messages up to this date (YYYY-MM-DD)",
+    channel="Only messages from this channel"
 )
 async def export_command(
     interaction: discord.Interaction,
     format: str = "json",
-    include_replies: bool = True
+    include_replies: bool = True,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    channel: Optional[discord.TextChannel] = None
 ):
     """Export data in specified format"""
     await interaction.response.defer(thinking=True)
@@ -181,8 +351,19 @@ async def export_command(
         await interaction.followup.send("📭 No data to export!")
         return
     
+    try:
+        since_time, until_time = parse_range(since, until)
+    except ValueError:
+        await interaction.followup.send("❌ Dates must look like YYYY-MM-DD!")
+        return
+    
+    channel_name = channel.name if channel else None
+    if not data_collector.count(guild_id, since_time, until_time, channel_name):
+        await interaction.followup.send("📭 No messages in that range!")
+        return
+    
     # Create export
-    filename = await create_export(guild_id, format, interaction.user.id)
+    filename = await create_export(guild_id, format, (since_time, until_time, channel_name))
     
     if filename:
         await interaction.followup.send(
@@ -193,7 +374,17 @@ async def export_command(
         await interaction.followup.send("❌ Failed to export data!")
 
 @bot.tree.command(name="stats", description="Show statistics")
-async def stats_command(interaction: discord.Interaction):
+@app_commands.describe(
+    since="Only messages from this date on (YYYY-MM-DD)",
+    until="Only messages up to this date (YYYY-MM-DD)",
+    channel="Only messages from this channel"
+)
+async def stats_command(
+    interaction: discord.Interaction,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    channel: Optional[discord.TextChannel] = None
+):
     """Show data collection statistics"""
     guild_id = interaction.guild.id if interaction.guild else 0
     
@@ -201,7 +392,18 @@ async def stats_command(interaction: discord.Interaction):
         await interaction.response.send_message("📊 No data collected yet!", ephemeral=True)
         return
     
-    data = data_collector.data[guild_id]
+    try:
+        since_time, until_time = parse_range(since, until)
+    except ValueError:
+        await interaction.response.send_message("❌ Dates must look like YYYY-MM-DD!", ephemeral=True)
+        return
+    
+    channel_name = channel.name if channel else None
+    data = data_collector.select(guild_id, since_time, until_time, channel_name)
+    if not data:
+        await interaction.response.send_message("📊 No messages in that range!", ephemeral=True)
+        return
+    
     total = len(data)
     
     # Calculate statistics
@@ -210,8 +412,8 @@ async def stats_command(interaction: discord.Interaction):
     
     for msg in data:
         # Count by channel
-        channel = msg["channel"]
-        by_channel[channel] = by_channel.get(channel, 0) + 1
+        channel_label = msg["channel"]
+        by_channel[channel_label] = by_channel.get(channel_label, 0) + 1
         
         # Count by day
         day = msg["timestamp"][:10]
@@ -237,6 +439,18 @@ async def stats_command(interaction: discord.Interaction):
     avg_per_day = total / len(by_day) if by_day else 0
     embed.add_field(name="Average per Day", value=f"{avg_per_day:.1f}", inline=True)
     
+    # Recomputed only when the guild's data changes
+    total_replies = sum(len(msg.get("replies", [])) for msg in data)
+    key = (guild_id, since_time, until_time, channel_name)
+    latency = reply_stats_cache.get(key, data_collector.version(guild_id), data)
+    if latency:
+        embed.add_field(
+            name=f"Reply Timing ({total_replies} replies)",
+            value="```\n" + "\n".join(format_latency_lines(latency))[:1000] + "\n```",
+            inline=False
+        )
+    
+    embed.add_field(name="Edit Tracking", value=edit_tracker.summary(), inline=False)
     embed.set_footer(text=f"Requested by {interaction.user.name}")
     
     await interaction.response.send_message(embed=embed)
@@ -255,7 +469,10 @@ async def clear_command(interaction: discord.Interaction):
             guild_id = interaction.guild.id if interaction.guild else 0
             if guild_id in data_collector.data:
                 count = len(data_collector.data[guild_id])
+                edit_tracker.forget(data_collector.data[guild_id].values())
                 data_collector.data[guild_id].clear()
+                data_collector.index.clear_guild(guild_id)
+                data_collector.touch(guild_id)
                 await interaction.response.send_message(f"🗑️ Cleared {count} messages!", ephemeral=True)
             else:
                 await interaction.response.send_message("📭 No data to clear!", ephemeral=True)
@@ -304,16 +521,22 @@ async def settings_command(interaction: discord.Interaction):
         async def save_now(self, interaction: discord.Interaction, button: discord.ui.Button):
             await interaction.response.defer(thinking=True, ephemeral=True)
             guild_id = interaction.guild.id if interaction.guild else 0
-            filename = await create_export(guild_id, "json", interaction.user.id)
+            try:
+                entry = save_backup(guild_id)
+            except Exception as e:
+                await interaction.followup.send(f"❌ Save failed: {e}", ephemeral=True)
+                return
             
+            if entry is None:
+                await interaction.followup.send("No data to save!", ephemeral=True)
+                return
+            
+            filename = await create_export(guild_id, "json")
+            note = f"Data saved as backup `{entry['file']}`!"
             if filename:
-                await interaction.followup.send(
-                    "Data saved!",
-                    file=discord.File(filename),
-                    ephemeral=True
-                )
+                await interaction.followup.send(note, file=discord.File(filename), ephemeral=True)
             else:
-                await interaction.followup.send("No data to save!", ephemeral=True)
+                await interaction.followup.send(note, ephemeral=True)
         
         @discord.ui.button(label="❓ Help", style=discord.ButtonStyle.secondary, row=1)
         async def show_help(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -323,7 +546,9 @@ async def settings_command(interaction: discord.Interaction):
                 "**/export** - Export data\n"
                 "**/stats** - View statistics\n"
                 "**/clear** - Clear data\n"
-                "**/settings** - This menu\n\n"
+                "**/settings** - This menu\n"
+                "**!backup** / **Save Now** - Save a backup `!restore` can load "
+                "(kept like auto-backups), plus a JSON copy\n\n"
                 "*Only your messages are tracked*"
             )
             
@@ -353,7 +578,7 @@ async def fetch_cmd(ctx, limit: int = 50):
     collected = 0
     for channel in ctx.guild.text_channels:
         try:
-            async for message in channel.history(limit=min(limit, 100)):
+            async for message in request_scheduler.history(channel, min(limit, 100)):
                 if message.author.id == YOUR_USER_ID:
                     await track_message(message)
                     collected += 1
@@ -369,76 +594,143 @@ async def fetch_cmd(ctx, limit: int = 50):
     
     await ctx.send(f"✅ Collected {collected} messages!")
 
+@bot.command(name="queue")
+async def queue_cmd(ctx):
+    """Show REST request queue depth and wait times"""
+    lines = "\n".join(request_scheduler.summary_lines())
+    await ctx.send(f"🚦 **Request Queue**\n```\n{lines}\n```")
+
 @bot.command(name="backup")
 async def backup_cmd(ctx):
-    """Manual backup command"""
+    """Save a backup that !restore can load, and send a JSON copy"""
     await ctx.send("💾 Creating backup...")
     guild_id = ctx.guild.id if ctx.guild else 0
-    filename = await create_export(guild_id, "json", ctx.author.id)
+    try:
+        entry = save_backup(guild_id)
+    except Exception as e:
+        await ctx.send(f"❌ Backup failed: {e}")
+        return
     
+    if entry is None:
+        await ctx.send("No data to backup!")
+        return
+    
+    # The JSON copy comes from the export cache and is only kept for a day
+    filename = await create_export(guild_id, "json")
+    note = f"Backup created: `{entry['file']}`"
     if filename:
-        await ctx.send("Backup created!", file=discord.File(filename))
+        await ctx.send(note, file=discord.File(filename))
     else:
-        await ctx.send("No data to backup!")
+        await ctx.send(note)
+
+@bot.command(name="restore")
+@commands.has_permissions(manage_messages=True)
+async def restore_cmd(ctx):
+    """Restore this server's data from the latest backup"""
+    guild_id = ctx.guild.id if ctx.guild else 0
+    
+    try:
+        records = backup_manager.restore(guild_id)
+    except BackupCorrupted as e:
+        await ctx.send(f"❌ Backup failed verification: `{e}`")
+        return
+    
+    if not records:
+        await ctx.send("📭 No backups found for this server!")
+        return
+    
+    if guild_id in data_collector.data:
+        edit_tracker.forget(data_collector.data[guild_id].values())
+    data_collector.data[guild_id] = CowStore((record["id"], record) for record in records)
+    data_collector.index.rebuild(guild_id, records)
+    edit_tracker.index_replies(records)
+    data_collector.touch(guild_id)
+    await ctx.send(f"♻️ Restored {len(records)} messages from backup!")
 
 # ========================
 # HELPER FUNCTIONS
 # ========================
 
-async def create_export(guild_id: int, format: str, user_id: int) -> Optional[str]:
-    """Create export file"""
-    if guild_id not in data_collector.data or not data_collector.data[guild_id]:
+def save_backup(guild_id: int) -> Optional[dict]:
+    """Back up a guild now like the hourly auto-backup, returns the newest backup entry"""
+    records = data_collector.select(guild_id)
+    if not records:
         return None
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    user_folder = DATA_FOLDER / str(user_id)
-    user_folder.mkdir(exist_ok=True)
-    
-    filename = user_folder / f"export_{timestamp}.{format}"
+    # None when the latest backup already holds this data
+    backup_manager.backup(guild_id, records)
+    return backup_manager.entries(guild_id)[-1]
+
+async def create_export(guild_id: int, format: str,
+                        filters: tuple = (None, None, None)) -> Optional[Path]:
+    """Create export file of the guild's messages matching (since, until, channel) filters
+    
+    While the guild's data is unchanged, repeated requests get the cached file back
+    without selecting any records.
+    """
+    format = format.lower()
+    key = (guild_id, data_collector.version(guild_id), format, filters)
+    cached = export_cache.get(key)
+    if cached:
+        return cached
+    
+    records = data_collector.select(guild_id, *filters)
+    if not records:
+        return None
     
+    filename = export_cache.path_for(key, format)
     try:
-        if format.lower() == "json":
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data_collector.data[guild_id], f, indent=2, ensure_ascii=False)
-        
-        elif format.lower() == "csv":
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['ID', 'Author', 'Content', 'Timestamp', 'Channel', 'Attachments']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                for msg in data_collector.data[guild_id]:
-                    writer.writerow({
-                        'ID': msg['id'],
-                        'Author': msg['author'],
-                        'Content': msg['content'][:100],
-                        'Timestamp': msg['timestamp'],
-                        'Channel': msg['channel'],
-                        'Attachments': msg['attachments']
-                    })
-        
-        return filename
-        
+        # Selected records are a snapshot, so messages keep arriving while the file is written
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, write_atomic, filename,
+                                   lambda path: write_export(records, format, path))
     except Exception as e:
         print(f"Export error: {e}")
         return None
+    
+    export_cache.put(key, filename)
+    return filename
 
-async def periodic_backup():
-    """Automatically backup data every hour"""
-    await bot.wait_until_ready()
+def write_export(records: List[dict], format: str, filename: Path):
+    """Write records as a JSON or CSV export"""
+    if format == "json":
+        serializer.dump(records, filename)
+    
+    elif format == "csv":
+        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+            fieldnames = ['ID', 'Author', 'Content', 'Timestamp', 'Channel', 'Attachments', 'Deleted']
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            
+            writer.writeheader()
+            for msg in records:
+                writer.writerow({
+                    'ID': msg['id'],
+                    'Author': msg['author'],
+                    'Content': msg['content'][:100],
+                    'Timestamp': msg['timestamp'],
+                    'Channel': msg['channel'],
+                    'Attachments': msg['attachments'],
+                    'Deleted': msg.get('deleted', False)
+                })
     
-    while not bot.is_closed():
+    else:
+        raise ValueError(f"Unknown export format: {format}")
+
+async def periodic_backup(client: commands.Bot = bot):
+    """Automatically backup changed guilds every hour"""
+    await client.wait_until_ready()
+    
+    while not client.is_closed():
         await asyncio.sleep(3600)  # 1 hour
         
-        for guild_id, data in data_collector.data.items():
-            if data:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-                filename = DATA_FOLDER / f"auto_backup_{guild_id}_{timestamp}.json"
-                
+        for guild_id in list(data_collector.data):
+            records = data_collector.select(guild_id)
+            if records:
                 try:
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, indent=2, ensure_ascii=False)
-                    print(f"💾 Auto-backup for guild {guild_id}")
+                    entry = backup_manager.backup(guild_id, records)
+                    if entry:
+                        print(f"💾 Auto-backup ({entry['kind']}) for guild {guild_id}")
+                    backup_manager.apply_retention(guild_id)
                 except Exception as e:
                     print(f"Backup error: {e}")
 
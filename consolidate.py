@@ -0,0 +1,158 @@
+"""
+Export Consolidation
+Merges every overlapping save, export and backup into one deduplicated JSONL dataset
+
+Records are sorted with an external merge sort, so memory use is bounded by
+--run-size no matter how much data the folders hold.
+
+Usage:
+    python consolidate.py --output consolidated.jsonl
+    python consolidate.py --output consolidated.jsonl.gz --run-size 50000
+"""
+
+import argparse
+import csv
+import gzip
+import heapq
+import json
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from history_query import DEFAULT_FOLDERS, discover_files, json_records, normalize
+from serializers import get_serializer
+
+# Runs merged at once; more runs are merged in several passes
+MERGE_FAN_IN = 64
+MAX_VERSION = 10 ** 20 - 1
+
+
+def snapshot_records(path: Path) -> Iterator[Tuple[str, dict]]:
+    """Yield (guild, raw record) pairs from one snapshot file"""
+    if path.name.endswith(".csv"):
+        guild = path.parent.name if path.parent.name.isdigit() else ""
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                yield guild, row
+    else:
+        opener = gzip.open if path.name.endswith(".gz") else open
+        with opener(path, 'rb') as f:
+            data = get_serializer().loads(f.read())
+        yield from json_records(data)
+
+
+def sort_lines(paths: Iterable[Path]) -> Iterator[str]:
+    """Turn every record into a line whose text order is (id, best version first)"""
+    for path in paths:
+        # CSV exports truncate content, so any JSON copy beats a CSV copy
+        fidelity = 1 if path.name.endswith(".csv") else 0
+        inverse_version = MAX_VERSION - path.stat().st_mtime_ns
+
+        try:
+            for guild, raw in snapshot_records(path):
+                row = normalize(guild, raw)
+                if row is None:
+                    continue
+                message_id, guild, channel, timestamp, _ = row
+                record = {
+                    "id": message_id,
+                    "guild": guild,
+                    "channel": channel,
+                    "timestamp": timestamp,
+                    "source": str(path),
+                    "data": raw
+                }
+                encoded = json.dumps(record, ensure_ascii=False, default=str)
+                yield f"{message_id:020d} {fidelity} {inverse_version:020d} {encoded}\n"
+        except Exception as e:
+            print(f"⚠️ Skipping {path}: {e}")
+
+
+def write_run(lines: List[str], tmp_dir: Path) -> Path:
+    lines.sort()
+    with tempfile.NamedTemporaryFile('w', suffix=".run", dir=tmp_dir, delete=False, encoding='utf-8') as f:
+        f.writelines(lines)
+        return Path(f.name)
+
+
+def spill_runs(lines: Iterable[str], run_size: int, tmp_dir: Path) -> List[Path]:
+    """Sort fixed-size chunks in memory and spill each one to disk"""
+    runs = []
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= run_size:
+            runs.append(write_run(buffer, tmp_dir))
+            buffer = []
+    if buffer:
+        runs.append(write_run(buffer, tmp_dir))
+    return runs
+
+
+def merge_runs(runs: List[Path], tmp_dir: Path) -> List[Path]:
+    """Merge runs in passes until few enough remain to open at once"""
+    while len(runs) > MERGE_FAN_IN:
+        merged = []
+        for start in range(0, len(runs), MERGE_FAN_IN):
+            group = runs[start:start + MERGE_FAN_IN]
+            files = [open(run, 'r', encoding='utf-8') for run in group]
+            with tempfile.NamedTemporaryFile('w', suffix=".run", dir=tmp_dir, delete=False, encoding='utf-8') as out:
+                out.writelines(heapq.merge(*files))
+                merged.append(Path(out.name))
+            for f, run in zip(files, group):
+                f.close()
+                run.unlink()
+        runs = merged
+    return runs
+
+
+def consolidate(output: Path, folders: Iterable[str] = DEFAULT_FOLDERS,
+                run_size: int = 100000, tmp_dir: Optional[Path] = None) -> Tuple[int, int]:
+    """Write the newest copy of every message, sorted by id
+
+    Returns (records read, records written).
+    """
+    paths = discover_files(folders)
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as work_dir:
+        work_dir = Path(work_dir)
+        runs = spill_runs(sort_lines(paths), run_size, work_dir)
+        runs = merge_runs(runs, work_dir)
+
+        files = [open(run, 'r', encoding='utf-8') for run in runs]
+        opener = gzip.open if output.name.endswith(".gz") else open
+        read = written = 0
+        last_id = None
+
+        try:
+            with opener(output, 'wt', encoding='utf-8') as out:
+                for line in heapq.merge(*files):
+                    read += 1
+                    message_id = line[:20]
+                    # The first line for each id is its best version
+                    if message_id == last_id:
+                        continue
+                    last_id = message_id
+                    out.write(line[44:])
+                    written += 1
+        finally:
+            for f in files:
+                f.close()
+
+    return read, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidate saved history into one deduplicated dataset")
+    parser.add_argument("--output", type=Path, default=Path("consolidated.jsonl"), help="JSONL output (.gz to compress)")
+    parser.add_argument("--folders", nargs="+", default=list(DEFAULT_FOLDERS), help="Data folders to scan")
+    parser.add_argument("--run-size", type=int, default=100000, help="Records sorted in memory at once")
+    parser.add_argument("--tmp-dir", type=Path, default=None, help="Where to spill sorted runs")
+    args = parser.parse_args()
+
+    read, written = consolidate(args.output, args.folders, args.run_size, args.tmp_dir)
+    print(f"💾 Consolidated {read} records into {written} unique messages: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
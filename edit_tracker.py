@@ -0,0 +1,117 @@
+"""
+Edit and Delete Tracking
+Applies raw gateway edit/delete events to stored records by id, without the message cache
+"""
+
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Optional
+
+import discord
+
+from snapshots import CowStore
+
+
+class EditTracker:
+    """Updates tracked messages and replies in place when they are edited or deleted
+
+    Raw events fire for every message the bot can see, cached or not, so each
+    one costs a dict lookup and most are ignored. `store_for(guild_id)` returns
+    the store holding a guild's messages; records are read in place and only
+    made writable (copied, if a snapshot shares them) once a change applies.
+    Replies are indexed here by their own id and changed through their parent.
+    """
+
+    def __init__(self, store_for: Callable[[Optional[int]], Optional[CowStore]],
+                 keep_revisions: bool = False, max_revisions: int = 20):
+        self.store_for = store_for
+        self.keep_revisions = keep_revisions
+        self.max_revisions = max_revisions
+        # reply id -> id of the tracked message it replies to
+        self.replies: Dict[int, int] = {}
+        self.stats = {"edits": 0, "deletes": 0, "bulk_deletes": 0, "ignored": 0}
+
+    def index_reply(self, parent_id: int, reply: Dict):
+        """Make a stored reply findable by its own id"""
+        if "id" in reply:
+            self.replies[reply["id"]] = parent_id
+
+    def index_replies(self, records: Iterable[Dict], key: str = "id"):
+        """Index the replies of messages loaded from disk"""
+        for record in records:
+            for reply in record.get("replies") or []:
+                self.index_reply(record[key], reply)
+
+    def forget(self, records: Iterable[Dict]):
+        """Drop the replies of messages that are no longer stored"""
+        for record in records:
+            for reply in record.get("replies") or []:
+                self.replies.pop(reply.get("id"), None)
+
+    def find(self, guild_id: Optional[int], message_id: int, writable: bool = False) -> Optional[Dict]:
+        """A tracked message or reply, read-only unless writable is set"""
+        store = self.store_for(guild_id)
+        if store is None:
+            return None
+        get = store.writable if writable else store.get
+        if message_id in store:
+            return get(message_id)
+
+        parent_id = self.replies.get(message_id)
+        if parent_id not in store:
+            return None
+        for reply in get(parent_id).get("replies") or []:
+            if reply.get("id") == message_id:
+                return reply
+        return None
+
+    def apply_edit(self, payload: discord.RawMessageUpdateEvent) -> Optional[Dict]:
+        """Update content from an edit event, returns the record if it changed"""
+        content = payload.data.get("content")
+        record = self.find(payload.guild_id, payload.message_id)
+
+        # Embed unfurls also arrive as edits, without new content
+        if record is None or content is None or content == record.get("content"):
+            self.stats["ignored"] += 1
+            return None
+
+        record = self.find(payload.guild_id, payload.message_id, writable=True)
+        edited_at = payload.data.get("edited_timestamp") or datetime.now(timezone.utc).isoformat()
+        if self.keep_revisions:
+            revisions = record.setdefault("revisions", [])
+            revisions.append({
+                "content": record.get("content"),
+                "timestamp": record.get("edited_at", record.get("timestamp"))
+            })
+            del revisions[:-self.max_revisions]
+
+        record["content"] = content
+        record["edited_at"] = edited_at
+        self.stats["edits"] += 1
+        return record
+
+    def mark_deleted(self, guild_id: Optional[int], message_id: int, deleted_at: str) -> bool:
+        record = self.find(guild_id, message_id)
+        if record is None or record.get("deleted"):
+            self.stats["ignored"] += 1
+            return False
+
+        record = self.find(guild_id, message_id, writable=True)
+        record["deleted"] = True
+        record["deleted_at"] = deleted_at
+        self.stats["deletes"] += 1
+        return True
+
+    def apply_delete(self, payload: discord.RawMessageDeleteEvent) -> bool:
+        """Mark a tracked message as deleted, returns True if it was tracked"""
+        return self.mark_deleted(payload.guild_id, payload.message_id, datetime.now(timezone.utc).isoformat())
+
+    def apply_bulk_delete(self, payload: discord.RawBulkMessageDeleteEvent) -> int:
+        """Mark every tracked message of a purge as deleted in one pass, returns how many"""
+        deleted_at = datetime.now(timezone.utc).isoformat()
+        self.stats["bulk_deletes"] += 1
+        return sum(self.mark_deleted(payload.guild_id, message_id, deleted_at) for message_id in payload.message_ids)
+
+    def summary(self) -> str:
+        """One line of counters for the stats commands"""
+        return (f"{self.stats['edits']} edits, {self.stats['deletes']} deletes applied, "
+                f"{self.stats['ignored']} events ignored")
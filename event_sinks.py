@@ -0,0 +1,338 @@
+"""
+Event Sinks
+Streams tracked messages and replies to other services in batches, without ever blocking on_message
+
+Delivery is at-least-once: a batch leaves the queue only after the backend has
+taken it, and is sent again (possibly twice) after a failure, so consumers
+should deduplicate on "event_id". When the queue is full, new events are
+appended to a spill file and sent from there once the queue has drained;
+without a spill file they are dropped and counted rather than waiting.
+"""
+
+import asyncio
+import os
+from collections import deque
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+from serializers import Serializer, get_serializer
+
+# Fields of a parsed message (see ingestion.parse_message) that go into events
+EVENT_FIELDS = ("id", "guild_id", "guild", "channel_id", "channel", "author", "author_id",
+                "content", "timestamp", "reference_id")
+
+
+def message_event(kind: str, parsed: Dict) -> Dict:
+    """Build a "message" or "reply" event from a parsed message"""
+    event = {field: parsed.get(field) for field in EVENT_FIELDS}
+    event["type"] = kind
+    event["event_id"] = f"{kind}:{parsed['id']}"
+    event["published_at"] = datetime.now(timezone.utc).isoformat()
+    return event
+
+
+class SinkBackend:
+    """Delivers one batch of encoded events; raising means nothing is acknowledged"""
+
+    async def send(self, lines: List[bytes]):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class UnixSocketBackend(SinkBackend):
+    """Newline-delimited JSON over a Unix domain socket, reconnecting as needed"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def send(self, lines: List[bytes]):
+        if self.writer is None or self.writer.is_closing():
+            _, self.writer = await asyncio.open_unix_connection(self.path)
+
+        try:
+            self.writer.write(b"".join(line + b"\n" for line in lines))
+            await self.writer.drain()
+        except Exception:
+            await self.close()
+            raise
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class RedisError(Exception):
+    """Raised when a Redis-compatible server answers with an error reply"""
+
+
+class RedisStreamBackend(SinkBackend):
+    """XADD to a Redis stream over raw RESP, one pipelined round trip per batch
+
+    Speaks only the protocol, so it works with Redis or any local stand-in that
+    implements XADD, and needs no client library.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 6379,
+                 stream: str = "discord:events", maxlen: int = 100000):
+        self.host = host
+        self.port = port
+        self.stream = stream.encode('utf-8')
+        self.maxlen = str(maxlen).encode('ascii')
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    @staticmethod
+    def command(*parts: bytes) -> bytes:
+        """Encode a command as a RESP array of bulk strings"""
+        encoded = [b"*%d\r\n" % len(parts)]
+        for part in parts:
+            encoded.append(b"$%d\r\n%s\r\n" % (len(part), part))
+        return b"".join(encoded)
+
+    async def read_reply(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        if line.startswith(b"-"):
+            raise RedisError(line[1:].strip().decode('utf-8', 'replace'))
+        if line.startswith(b"$") and int(line[1:]) >= 0:
+            await self.reader.readexactly(int(line[1:]) + 2)
+
+    async def send(self, lines: List[bytes]):
+        if self.writer is None or self.writer.is_closing():
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        try:
+            self.writer.write(b"".join(
+                self.command(b"XADD", self.stream, b"MAXLEN", b"~", self.maxlen, b"*", b"event", line)
+                for line in lines
+            ))
+            await self.writer.drain()
+            for _ in lines:
+                await self.read_reply()
+        except Exception:
+            await self.close()
+            raise
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+class RotatingFileBackend(SinkBackend):
+    """Appends JSON lines to events.jsonl, rotating to events.1.jsonl ... events.N.jsonl"""
+
+    def __init__(self, folder: Path, max_bytes: int = 10 * 1024 * 1024, keep: int = 5):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.file = self.folder / "events.jsonl"
+        self.max_bytes = max_bytes
+        self.keep = keep
+
+    def rotated(self, number: int) -> Path:
+        return self.folder / f"events.{number}.jsonl"
+
+    def rotate(self):
+        self.rotated(self.keep).unlink(missing_ok=True)
+        for number in range(self.keep - 1, 0, -1):
+            if self.rotated(number).exists():
+                os.replace(self.rotated(number), self.rotated(number + 1))
+        os.replace(self.file, self.rotated(1))
+
+    def write(self, lines: List[bytes]):
+        if self.file.exists() and self.file.stat().st_size >= self.max_bytes:
+            self.rotate()
+
+        with open(self.file, 'ab') as f:
+            f.write(b"".join(line + b"\n" for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def send(self, lines: List[bytes]):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.write, lines)
+
+
+class EventSink:
+    """Bounded event queue drained in batches by one background task"""
+
+    def __init__(
+        self,
+        backend: SinkBackend,
+        max_pending: int = 10000,
+        batch_size: int = 100,
+        linger: float = 0.5,
+        max_backoff: float = 60.0,
+        serializer: Optional[Serializer] = None,
+        spill_file: Optional[Path] = None
+    ):
+        self.backend = backend
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.linger = linger  # How long a partial batch waits for more events
+        self.max_backoff = max_backoff
+        self.serializer = serializer or get_serializer()
+
+        self.pending: Deque[Dict] = deque()
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task = None
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0, "spilled": 0, "batches": 0, "retries": 0}
+
+        # Overflow goes to spill_file; it is renamed to draining_file while being sent
+        self.spill_file = Path(spill_file) if spill_file else None
+        self.draining_file = self.spill_file.with_name(self.spill_file.name + ".draining") if spill_file else None
+        self.spill_offset = 0  # Bytes of draining_file already delivered
+        # Left over from an earlier run, so it is sent before anything new
+        self.spilled = bool(spill_file) and (self.spill_file.exists() or self.draining_file.exists())
+
+    def publish(self, event: Dict) -> bool:
+        """Queue an event without waiting, returns False if it was dropped"""
+        if self.spilled or len(self.pending) >= self.max_pending:
+            # Once spilling, everything goes to disk until it drains, to keep events in order
+            if self.spill_file is None:
+                self.stats["dropped"] += 1
+                return False
+            self.spill([event])
+            self.stats["spilled"] += 1
+        else:
+            self.pending.append(event)
+        self.stats["published"] += 1
+        if self.wakeup is not None and (self.spilled or len(self.pending) >= self.batch_size):
+            self.wakeup.set()
+        return True
+
+    def spill(self, events: List[Dict]):
+        """Append events to the spill file (a small unsynced write, cheap enough for on_message)"""
+        with open(self.spill_file, 'ab') as f:
+            f.write(b"".join(self.serializer.dumps(event) + b"\n" for event in events))
+        self.spilled = True
+
+    def start(self):
+        """Start delivering in the background (safe to call on every reconnect)"""
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        """Deliver batches as they fill up or linger expires, backing off on failure"""
+        backoff = 1.0
+        while True:
+            if len(self.pending) < self.batch_size and not self.spilled:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), self.linger)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+
+            if not self.pending and not self.spilled:
+                continue
+
+            try:
+                if self.pending:
+                    await self.deliver()
+                else:
+                    await self.deliver_spilled()
+                backoff = 1.0
+            except Exception as e:
+                self.stats["retries"] += 1
+                print(f"⚠️ Event sink delivery failed, retrying in {backoff:.0f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    async def deliver(self):
+        """Send the oldest batch and drop it from the queue once the backend accepted it"""
+        batch = list(islice(self.pending, self.batch_size))
+        await self.backend.send([self.serializer.dumps(event) for event in batch])
+
+        # Only this task removes events and publish only appends, so these are the sent ones
+        for _ in batch:
+            self.pending.popleft()
+        self.stats["batches"] += 1
+        self.stats["delivered"] += len(batch)
+
+    def read_spilled(self):
+        """The next batch of complete lines in the draining file, and where it ends"""
+        batch = []
+        with open(self.draining_file, 'rb') as f:
+            f.seek(self.spill_offset)
+            while len(batch) < self.batch_size:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    # End of file, or a line cut short by a crash
+                    break
+                batch.append(line[:-1])
+            return batch, f.tell()
+
+    async def deliver_spilled(self):
+        """Send the oldest batch of spilled events, moving to the next spill file when one is done"""
+        if not self.draining_file.exists():
+            if not self.spill_file.exists():
+                self.spilled = False
+                return
+            os.replace(self.spill_file, self.draining_file)
+            self.spill_offset = 0
+
+        loop = asyncio.get_running_loop()
+        batch, end = await loop.run_in_executor(None, self.read_spilled)
+        if not batch:
+            self.draining_file.unlink()
+            self.spilled = self.spill_file.exists()
+            return
+
+        await self.backend.send(batch)
+        self.spill_offset = end
+        self.stats["batches"] += 1
+        self.stats["delivered"] += len(batch)
+
+    async def close(self, timeout: float = 5.0):
+        """Stop the background task, then try once to deliver what is left
+
+        Events that cannot be delivered in time are spilled to disk, if there
+        is a spill file, and sent after the next start.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        try:
+            while self.pending:
+                await asyncio.wait_for(self.deliver(), timeout)
+        except Exception as e:
+            if self.spill_file is None:
+                print(f"⚠️ {len(self.pending)} events were not delivered: {e}")
+            else:
+                # Older than anything already spilled, but still delivered
+                self.spill(list(self.pending))
+                print(f"⚠️ {len(self.pending)} events saved to {self.spill_file.name} for the next start: {e}")
+                self.pending.clear()
+        await self.backend.close()
+
+
+def create_sink(spec: Optional[str], folder: Path) -> Optional[EventSink]:
+    """Build a sink from an EVENT_SINK setting
+
+    "file" writes rotating JSONL under folder/events, "unix:/path/to.sock" streams
+    JSONL to a socket and "redis://host:port/stream" adds to a Redis stream.
+    Overflow is spilled to folder/event_spill.jsonl.
+    """
+    if not spec:
+        return None
+    spill_file = Path(folder) / "event_spill.jsonl"
+    if spec == "file":
+        return EventSink(RotatingFileBackend(Path(folder) / "events"), spill_file=spill_file)
+    if spec.startswith("unix:"):
+        return EventSink(UnixSocketBackend(spec[len("unix:"):]), spill_file=spill_file)
+    if spec.startswith("redis://"):
+        address, _, stream = spec[len("redis://"):].partition("/")
+        host, _, port = address.partition(":")
+        backend = RedisStreamBackend(host or "localhost", int(port or 6379), stream or "discord:events")
+        return EventSink(backend, spill_file=spill_file)
+    raise ValueError(f"Unknown event sink: {spec}")
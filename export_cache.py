@@ -0,0 +1,92 @@
+"""
+Export Cache
+Reuses export files while a guild's data is unchanged, evicting by total size and age
+"""
+
+import hashlib
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Optional
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_MAX_AGE = 24 * 3600
+
+
+def write_atomic(path: Path, write: Callable[[Path], None]):
+    """Run write(tmp_path) and move the result to path, so readers never see half a file"""
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+class ExportCache:
+    """Export files keyed by (guild, data version, format, filters)
+
+    Data versions only live in memory, so files left over from an earlier run
+    are removed on startup instead of being matched against new versions.
+    """
+
+    def __init__(self, folder: Path, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        for leftover in self.folder.iterdir():
+            if leftover.is_file():
+                leftover.unlink()
+
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # key -> {"path", "size", "created", "used"}
+        self.entries: Dict[Hashable, Dict] = {}
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def path_for(self, key: tuple, format: str) -> Path:
+        """Where the export for a key is written"""
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:12]
+        guild_id, version = key[0], key[1]
+        return self.folder / f"export_{guild_id}_v{version}_{digest}.{format}"
+
+    def get(self, key: tuple) -> Optional[Path]:
+        """The cached file for a key, if it is still fresh and on disk"""
+        entry = self.entries.get(key)
+        now = time.time()
+        if entry is None or now - entry["created"] > self.max_age or not entry["path"].exists():
+            if entry is not None:
+                self.remove(key)
+            self.stats["misses"] += 1
+            return None
+
+        entry["used"] = now
+        self.stats["hits"] += 1
+        return entry["path"]
+
+    def put(self, key: tuple, path: Path):
+        """Register a freshly written export, then evict to stay within limits"""
+        now = time.time()
+        self.entries[key] = {"path": path, "size": path.stat().st_size, "created": now, "used": now}
+        self.evict(keep=key)
+
+    def remove(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            entry["path"].unlink(missing_ok=True)
+            self.stats["evicted"] += 1
+
+    def evict(self, keep: Optional[tuple] = None):
+        """Drop expired exports, then the least recently used until under max_bytes"""
+        now = time.time()
+        for key in [k for k, e in self.entries.items() if now - e["created"] > self.max_age and k != keep]:
+            self.remove(key)
+
+        total = sum(entry["size"] for entry in self.entries.values())
+        for key in sorted(self.entries, key=lambda k: self.entries[k]["used"]):
+            if total <= self.max_bytes:
+                break
+            if key != keep:
+                total -= self.entries[key]["size"]
+                self.remove(key)
@@ -0,0 +1,239 @@
+"""
+History Query Engine
+Parallel aggregates over every export, save and backup file the bots have written
+
+Usage:
+    python history_query.py --by channel --since 2025-01-01
+    python history_query.py --by day --guild "My Server" --until 2025-06-30
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import os
+import pickle
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from serializers import get_serializer
+
+# Folders written by single_server_bot.py, multi_server_bot.py and commands_bot.py
+DEFAULT_FOLDERS = ("collected_data", "multi_server_data", "commands_bot_data")
+CACHE_FOLDER = Path(".query_cache")
+
+# Bookkeeping files that live next to the data but hold no messages
+SKIP_FILES = {"manifest.json", "manifest.jsonl", "command_sync.json"}
+
+# (message_id, guild, channel, timestamp, reply_count)
+Record = Tuple[int, str, str, str, Optional[int]]
+
+GROUPINGS = {
+    "channel": lambda r: r[2],
+    "guild": lambda r: r[1],
+    "day": lambda r: r[3][:10],
+    "month": lambda r: r[3][:7],
+    "hour": lambda r: r[3][11:13],
+}
+
+
+def discover_files(folders: Iterable[str] = DEFAULT_FOLDERS) -> List[Path]:
+    """Find every JSON, gzipped JSON and CSV snapshot under the data folders"""
+    found = []
+    for folder in folders:
+        root = Path(folder)
+        if not root.is_dir():
+            continue
+        for path in root.rglob("*"):
+            if path.name in SKIP_FILES or not path.is_file():
+                continue
+            if path.name.endswith((".json", ".json.gz", ".csv")):
+                found.append(path)
+    return sorted(found)
+
+
+def json_records(data) -> Iterable[Tuple[str, Dict]]:
+    """Yield raw message dicts from any of the bots' JSON layouts, tagged with their guild"""
+    if isinstance(data, list):
+        # commands_bot.py exports and old auto-backups
+        for record in data:
+            yield record.get("guild", ""), record
+    elif "your_messages" in data:
+        # single_server_bot.py saves
+        guilds = [info.get("name", "") for info in data.get("server_info", {}).values()]
+        guild = guilds[0] if guilds else ""
+        for record in data["your_messages"].values():
+            yield guild, record
+    elif "messages" in data:
+        # multi_server_bot.py saves and auto-saves
+        for record in data["messages"].values():
+            yield data.get("guild_name", ""), record
+    elif "records" in data or "upserts" in data:
+        # backups.py full and differential backups
+        for record in data.get("records", data.get("upserts", [])):
+            yield record.get("guild", ""), record
+
+
+def normalize(guild: str, record: Dict) -> Optional[Record]:
+    """Reduce a stored message to the fields queries need"""
+    message_id = record.get("id", record.get("message_id", record.get("ID", record.get("Message_ID"))))
+    if not message_id:
+        return None
+
+    replies = record.get("replies", record.get("Replies", record.get("Reply_Count")))
+    if isinstance(replies, list):
+        replies = len(replies)
+    elif replies not in (None, ""):
+        replies = int(replies)
+    else:
+        replies = None
+
+    channel = record.get("channel", record.get("channel_name", record.get("Channel", "")))
+    timestamp = record.get("timestamp", record.get("Timestamp", ""))
+    return int(message_id), guild or "", channel or "", timestamp or "", replies
+
+
+def parse_file(path: Path) -> List[Record]:
+    """Parse one snapshot file into normalized records (runs in a worker process)"""
+    try:
+        if path.name.endswith(".csv"):
+            # multi_server_bot.py keeps CSVs in a folder named after the guild id
+            guild = path.parent.name if path.parent.name.isdigit() else ""
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                rows = [normalize(guild, row) for row in csv.DictReader(f)]
+        else:
+            opener = gzip.open if path.name.endswith(".gz") else open
+            with opener(path, 'rb') as f:
+                data = get_serializer().loads(f.read())
+            rows = [normalize(guild, record) for guild, record in json_records(data)]
+    except Exception as e:
+        print(f"⚠️ Skipping {path}: {e}")
+        return []
+
+    return [row for row in rows if row is not None]
+
+
+class ParseCache:
+    """Per-file parse results, reused while a file's mtime and size are unchanged"""
+
+    def __init__(self, folder: Path = CACHE_FOLDER):
+        self.folder = Path(folder)
+        self.folder.mkdir(exist_ok=True)
+
+    def entry_path(self, path: Path) -> Path:
+        key = hashlib.sha1(str(path.resolve()).encode('utf-8')).hexdigest()
+        return self.folder / f"{key}.pickle"
+
+    @staticmethod
+    def signature(path: Path) -> Tuple[int, int]:
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path: Path) -> Optional[List[Record]]:
+        entry = self.entry_path(path)
+        if not entry.exists():
+            return None
+        with open(entry, 'rb') as f:
+            signature, records = pickle.load(f)
+        return records if signature == self.signature(path) else None
+
+    def put(self, path: Path, records: List[Record]):
+        with open(self.entry_path(path), 'wb') as f:
+            pickle.dump((self.signature(path), records), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_records(paths: List[Path], workers: Optional[int] = None,
+                 cache: Optional[ParseCache] = None) -> List[Tuple[Path, List[Record]]]:
+    """Map step: parse every file, in parallel for anything not cached"""
+    results = {}
+    missing = []
+    for path in paths:
+        records = cache.get(path) if cache else None
+        if records is None:
+            missing.append(path)
+        else:
+            results[path] = records
+
+    if len(missing) > 1 and workers != 1:
+        chunksize = max(1, len(missing) // ((workers or os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse_file, missing, chunksize=chunksize))
+    else:
+        parsed = [parse_file(path) for path in missing]
+
+    for path, records in zip(missing, parsed):
+        results[path] = records
+        if cache:
+            cache.put(path, records)
+
+    return [(path, results[path]) for path in paths]
+
+
+def merge_newest(merged: Dict[int, Tuple[int, Record]], item: Tuple[int, List[Record]]) -> Dict[int, Tuple[int, Record]]:
+    """Reduce step: keep the copy of each message from the newest file"""
+    version, records = item
+    for record in records:
+        current = merged.get(record[0])
+        if current is None or current[0] <= version:
+            merged[record[0]] = (version, record)
+    return merged
+
+
+def query(by: str = "channel", since: Optional[str] = None, until: Optional[str] = None,
+          guild: Optional[str] = None, folders: Iterable[str] = DEFAULT_FOLDERS,
+          workers: Optional[int] = None, use_cache: bool = True) -> Counter:
+    """Count unique messages grouped by channel, guild, day, month or hour"""
+    paths = discover_files(folders)
+    parsed = load_records(paths, workers, ParseCache() if use_cache else None)
+
+    versioned = [(path.stat().st_mtime_ns, records) for path, records in parsed]
+    unique = reduce(merge_newest, versioned, {})
+
+    key = GROUPINGS[by]
+    counts = Counter()
+    for _, record in unique.values():
+        timestamp = record[3]
+        if since and timestamp < since:
+            continue
+        # Dates without a time include the whole day
+        if until and timestamp[:len(until)] > until:
+            continue
+        if guild and record[1] != guild:
+            continue
+        counts[key(record)] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query collected message history")
+    parser.add_argument("--by", choices=sorted(GROUPINGS), default="channel", help="Group counts by")
+    parser.add_argument("--since", help="Earliest timestamp, e.g. 2025-01-01")
+    parser.add_argument("--until", help="Latest timestamp, e.g. 2025-12-31")
+    parser.add_argument("--guild", help="Only count messages from this server name")
+    parser.add_argument("--folders", nargs="+", default=list(DEFAULT_FOLDERS), help="Data folders to scan")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="Re-parse every file")
+    args = parser.parse_args()
+
+    counts = query(args.by, args.since, args.until, args.guild, args.folders, args.workers, not args.no_cache)
+
+    if not counts:
+        print("📭 No messages found.")
+        return
+
+    # Time groupings read best in order, the rest by size
+    if args.by in ("day", "month", "hour"):
+        rows = sorted(counts.items())
+    else:
+        rows = counts.most_common()
+
+    print(f"📊 Messages by {args.by} ({sum(counts.values())} unique)")
+    for key, count in rows:
+        print(f"  {key or '(unknown)'}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Combined Host Bot
+Runs the single-server, multi-server and slash command bots as cogs on one gateway connection
+"""
+
+import discord
+from discord.ext import commands
+
+import commands_bot
+import multi_server_bot
+import single_server_bot
+from ingestion import IngestionPipeline
+from memory_budget import client_options
+from reply_resolver import ReplyResolver
+from rest_scheduler import request_scheduler
+from startup import ReadyTimer, TaskSupervisor
+
+# Configuration
+TOKEN = "YOUR_BOT_TOKEN_HERE"
+# Plugins earlier in the list answer overlapping text commands (e.g. !stats) first
+ENABLED_PLUGINS = ["simple", "multi_server", "commands"]
+LOW_MEMORY_MODE = False  # Skip member/message caches and unused intents (large servers)
+
+# Setup intents (union of what the plugins need)
+intents = discord.Intents.default()
+intents.message_content = True
+intents.members = True
+intents.guilds = True
+
+# Text commands are routed by the pipeline, so the built-in help would clash with !help
+bot = commands.Bot(command_prefix="!", help_command=None, http_trace=request_scheduler.trace_config(),
+                   **client_options(intents, LOW_MEMORY_MODE))
+pipeline = IngestionPipeline()
+task_supervisor = TaskSupervisor()
+ready_timer = ReadyTimer()
+
+# Plugins share one resolver, so a reply they both wait for costs one history lookup
+reply_resolver = ReplyResolver(scheduler=request_scheduler)
+single_server_bot.reply_resolver = multi_server_bot.reply_resolver = reply_resolver
+
+
+class TrackerPlugin(commands.Cog):
+    """Base cog that joins the shared ingestion pipeline while loaded"""
+
+    # Bot module whose raw edit/delete handlers update this plugin's records
+    module = None
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        pipeline.register(self)
+
+    async def cog_unload(self):
+        # Bot.close() unloads every cog, so this is also the shutdown path
+        pipeline.unregister(self)
+        await self.module.shutdown()
+
+    async def ingest(self, message: discord.Message, parsed: dict):
+        """Track an already parsed message"""
+
+    async def handle_command(self, message: discord.Message) -> bool:
+        """Answer a text command, returns True if it was one of ours"""
+        return False
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        await self.module.on_raw_message_edit(payload)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        await self.module.on_raw_message_delete(payload)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        await self.module.on_raw_bulk_message_delete(payload)
+
+
+class SimpleTrackingCog(TrackerPlugin):
+    """single_server_bot.py: your messages and replies, !hello/!save/!stats"""
+
+    module = single_server_bot
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        reply_resolver.start()
+        if single_server_bot.event_sink:
+            single_server_bot.event_sink.start()
+
+    async def ingest(self, message, parsed):
+        await single_server_bot.ingest_message(message, parsed)
+
+    async def handle_command(self, message):
+        return await single_server_bot.handle_command(message)
+
+
+class ServerSettingsCog(TrackerPlugin):
+    """multi_server_bot.py: per-server data, settings and prefixes"""
+
+    module = multi_server_bot
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        for guild in self.bot.guilds:
+            multi_server_bot.setup_guild(guild)
+
+        reply_resolver.start()
+        if multi_server_bot.event_sink:
+            multi_server_bot.event_sink.start()
+        if multi_server_bot.attachment_archiver:
+            await multi_server_bot.attachment_archiver.start()
+
+    async def ingest(self, message, parsed):
+        await multi_server_bot.ingest_message(message, parsed)
+
+    async def handle_command(self, message):
+        if not message.guild:
+            return False
+
+        multi_server_bot.setup_guild(message.guild)
+        return await multi_server_bot.process_commands(message.guild.id, message)
+
+
+class SlashCommandsCog(TrackerPlugin):
+    """commands_bot.py: slash commands, !fetch/!backup/!restore and auto-backup"""
+
+    module = commands_bot
+
+    async def cog_load(self):
+        await super().cog_load()
+
+        for command in commands_bot.bot.tree.get_commands():
+            self.bot.tree.add_command(command)
+
+        for command in commands_bot.bot.commands:
+            if command.name != "help":
+                self.bot.add_command(command)
+
+        self.bot.add_listener(commands_bot.on_command_error)
+
+    async def cog_unload(self):
+        await super().cog_unload()
+
+        for command in commands_bot.bot.tree.get_commands():
+            self.bot.tree.remove_command(command.name)
+
+        for command in commands_bot.bot.commands:
+            if command.name != "help":
+                self.bot.remove_command(command.name)
+
+        self.bot.remove_listener(commands_bot.on_command_error)
+
+        task_supervisor.cancel("periodic_backup")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        task_supervisor.ensure("periodic_backup", lambda: commands_bot.periodic_backup(self.bot))
+        if commands_bot.event_sink:
+            commands_bot.event_sink.start()
+        if commands_bot.attachment_archiver:
+            await commands_bot.attachment_archiver.start()
+
+    async def ingest(self, message, parsed):
+        if message.author.bot:
+            return
+
+        if parsed["author_id"] == commands_bot.YOUR_USER_ID:
+            await commands_bot.track_message(message, parsed)
+        elif message.reference:
+            await commands_bot.track_reply(message, parsed)
+
+
+PLUGINS = {
+    "simple": SimpleTrackingCog,
+    "multi_server": ServerSettingsCog,
+    "commands": SlashCommandsCog,
+}
+
+
+@bot.event
+async def setup_hook():
+    """Load enabled plugins before connecting"""
+    for name in ENABLED_PLUGINS:
+        await bot.add_cog(PLUGINS[name](bot))
+        print(f'🔌 Loaded plugin: {name}')
+
+    if bot.tree.get_commands():
+        await commands_bot.sync_slash_commands(bot)
+
+
+@bot.event
+async def on_ready():
+    """Bot startup handler"""
+    print(f'✅ Logged in as {bot.user} (ready in {ready_timer.mark_ready():.2f}s)')
+    print(f'🌍 Connected to {len(bot.guilds)} servers with {len(pipeline.plugins)} plugins')
+
+
+@bot.event
+async def on_disconnect():
+    ready_timer.mark_disconnect()
+
+
+@bot.event
+async def on_message(message):
+    """Parse each message once and hand it to every plugin"""
+    # Ignore bot's own messages
+    if message.author == bot.user:
+        return
+
+    handled = await pipeline.dispatch(message)
+
+    # Anything the plugins did not answer may still be a registered prefix command
+    if not handled:
+        await bot.process_commands(message)
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Host Bot...")
+    print(f"🔌 Plugins: {', '.join(ENABLED_PLUGINS)}")
+    bot.run(TOKEN)
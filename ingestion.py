@@ -0,0 +1,73 @@
+"""
+Shared Ingestion Pipeline
+Parses each incoming message once and fans it out to every enabled plugin
+"""
+
+from typing import Dict, List
+
+import discord
+
+
+def parse_message(message: discord.Message) -> Dict:
+    """Extract every field any of the bots store from a message"""
+    channel = message.channel
+    guild = message.guild
+    reference = message.reference
+
+    return {
+        "id": message.id,
+        "author": str(message.author),
+        "author_id": message.author.id,
+        "content": message.content,
+        "timestamp": message.created_at.isoformat(),
+        "channel_id": channel.id,
+        "channel": channel.name if hasattr(channel, 'name') else "DM",
+        "guild_id": guild.id if guild else 0,
+        "guild": guild.name if guild else "Direct Message",
+        "attachment_urls": [att.url for att in message.attachments],
+        "attachment_ids": [att.id for att in message.attachments],
+        "embeds": len(message.embeds),
+        "reference_id": reference.message_id if reference else None
+    }
+
+
+class IngestionPipeline:
+    """Dispatches parsed messages to registered plugins in order"""
+
+    def __init__(self):
+        self.plugins: List = []
+        self.stats = {"messages": 0, "errors": 0}
+
+    def register(self, plugin):
+        if plugin not in self.plugins:
+            self.plugins.append(plugin)
+
+    def unregister(self, plugin):
+        if plugin in self.plugins:
+            self.plugins.remove(plugin)
+
+    async def dispatch(self, message: discord.Message) -> bool:
+        """Parse a message once, let every plugin track it, then route text commands
+
+        Returns True if a plugin answered the message as a text command.
+        """
+        parsed = parse_message(message)
+        self.stats["messages"] += 1
+
+        for plugin in self.plugins:
+            try:
+                await plugin.ingest(message, parsed)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ [{type(plugin).__name__}] Error ingesting message: {e}")
+
+        # The first plugin that recognises a text command answers it
+        for plugin in self.plugins:
+            try:
+                if await plugin.handle_command(message):
+                    return True
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ [{type(plugin).__name__}] Error handling command: {e}")
+
+        return False
@@ -0,0 +1,40 @@
+"""
+Memory Budget Mode
+Client options that cache only what the bots use, for large or many guilds
+"""
+
+from typing import Dict, Optional
+
+import discord
+
+# Gateway events none of the bots handle; each one costs parsing and often cache entries
+UNUSED_INTENTS = (
+    "members", "presences", "moderation", "expressions", "integrations", "webhooks",
+    "invites", "voice_states", "guild_reactions", "dm_reactions", "guild_typing",
+    "dm_typing", "guild_scheduled_events", "auto_moderation_configuration",
+    "auto_moderation_execution", "guild_polls", "dm_polls",
+)
+
+
+def client_options(intents: discord.Intents, low_memory: bool,
+                   max_messages: Optional[int] = None) -> Dict:
+    """Keyword arguments for discord.Client / commands.Bot
+
+    The bots only read the author and content of incoming messages, so in
+    low-memory mode no members are cached or chunked, the message cache is off
+    (or capped at max_messages) and unused intents are dropped.
+    """
+    if not low_memory:
+        return {"intents": intents}
+
+    trimmed = discord.Intents(**dict(intents))
+    for name in UNUSED_INTENTS:
+        if hasattr(trimmed, name):
+            setattr(trimmed, name, False)
+
+    return {
+        "intents": trimmed,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": False,
+        "max_messages": max_messages,
+    }
@@ -0,0 +1,122 @@
+"""
+Message Index
+Sorted message ids per guild and per channel for time-range lookups by binary search
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, time, timezone
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+# Snowflakes hold milliseconds since the start of 2015 in their top 42 bits
+DISCORD_EPOCH_MS = 1420070400000
+TIMESTAMP_SHIFT = 22
+
+
+def snowflake_time(message_id: int) -> datetime:
+    """When a message was created, read from its id"""
+    ms = (message_id >> TIMESTAMP_SHIFT) + DISCORD_EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def time_snowflake(when: datetime, high: bool = False) -> int:
+    """Smallest (or largest, with high=True) id a message created at `when` can have"""
+    ms = int(when.timestamp() * 1000) - DISCORD_EPOCH_MS
+    return (max(ms, 0) << TIMESTAMP_SHIFT) + ((1 << TIMESTAMP_SHIFT) - 1 if high else 0)
+
+
+def parse_when(text: str, end_of_day: bool = False) -> datetime:
+    """Parse 'YYYY-MM-DD' or an ISO timestamp as UTC; bare dates can mean the end of that day"""
+    when = datetime.fromisoformat(text.strip())
+    if end_of_day and len(text.strip()) == 10:
+        when = datetime.combine(when.date(), time.max)
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when
+
+
+class MessageIndex:
+    """Message ids kept sorted per guild and per (guild, channel)
+
+    Only ids are indexed; records stay in the caller's store, so the index
+    never holds on to a record the store has since replaced.
+    """
+
+    def __init__(self, key: str = "id", channel_key: str = "channel"):
+        self.key = key
+        self.channel_key = channel_key
+        # message id -> channel, needed to find the id again on removal
+        self.channels: Dict[int, str] = {}
+        self.guild_ids: Dict[Hashable, List[int]] = {}
+        self.channel_ids: Dict[Tuple[Hashable, str], List[int]] = {}
+
+    def __contains__(self, message_id: int) -> bool:
+        return message_id in self.channels
+
+    @staticmethod
+    def insert(ids: List[int], message_id: int):
+        # Live messages arrive in id order, so this is almost always an append
+        if not ids or ids[-1] < message_id:
+            ids.append(message_id)
+        else:
+            insort(ids, message_id)
+
+    @staticmethod
+    def delete(ids: List[int], message_id: int):
+        position = bisect_left(ids, message_id)
+        if position < len(ids) and ids[position] == message_id:
+            del ids[position]
+
+    def add(self, guild_id: Hashable, record: Dict) -> bool:
+        """Index a record, returns False if its id is already indexed"""
+        message_id = record[self.key]
+        if message_id in self.channels:
+            return False
+
+        channel = record[self.channel_key]
+        self.channels[message_id] = channel
+        self.insert(self.guild_ids.setdefault(guild_id, []), message_id)
+        self.insert(self.channel_ids.setdefault((guild_id, channel), []), message_id)
+        return True
+
+    def remove(self, guild_id: Hashable, message_id: int) -> bool:
+        channel = self.channels.pop(message_id, None)
+        if channel is None:
+            return False
+        self.delete(self.guild_ids.get(guild_id, []), message_id)
+        self.delete(self.channel_ids.get((guild_id, channel), []), message_id)
+        return True
+
+    def clear_guild(self, guild_id: Hashable):
+        for message_id in self.guild_ids.pop(guild_id, []):
+            self.channels.pop(message_id, None)
+        for key in [k for k in self.channel_ids if k[0] == guild_id]:
+            del self.channel_ids[key]
+
+    def rebuild(self, guild_id: Hashable, records: Iterable[Dict]):
+        self.clear_guild(guild_id)
+        for record in records:
+            self.add(guild_id, record)
+
+    def span(self, guild_id: Hashable, since: Optional[datetime] = None,
+             until: Optional[datetime] = None, channel: Optional[str] = None) -> Tuple[List[int], int, int]:
+        """The sorted ids of a guild or channel, and the start and stop of a time range in them"""
+        if channel is None:
+            ids = self.guild_ids.get(guild_id, [])
+        else:
+            ids = self.channel_ids.get((guild_id, channel), [])
+
+        start = bisect_left(ids, time_snowflake(since)) if since else 0
+        stop = bisect_right(ids, time_snowflake(until, high=True)) if until else len(ids)
+        return ids, start, stop
+
+    def range(self, guild_id: Hashable, since: Optional[datetime] = None,
+              until: Optional[datetime] = None, channel: Optional[str] = None) -> List[int]:
+        """Message ids in a time range, oldest first, in time proportional to the result"""
+        ids, start, stop = self.span(guild_id, since, until, channel)
+        return ids[start:stop]
+
+    def count(self, guild_id: Hashable, since: Optional[datetime] = None,
+              until: Optional[datetime] = None, channel: Optional[str] = None) -> int:
+        """How many messages are in a time range, by binary search alone"""
+        _, start, stop = self.span(guild_id, since, until, channel)
+        return max(stop - start, 0)
@@ -4,17 +4,33 @@ Separate tracking for each server with server-specific commands
 """
 
 import discord
-import json
 import csv
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from attachment_archiver import AttachmentArchiver
+from edit_tracker import EditTracker
+from event_sinks import create_sink, message_event
+from ingestion import parse_message
+from memory_budget import client_options
+from reply_analytics import ReplyStatsCache, format_latency_lines
+from reply_resolver import ReplyResolver
+from rest_scheduler import request_scheduler
+from serializers import get_serializer
+from snapshots import CowStore
 
 # Configuration
 TOKEN = "YOUR_BOT_TOKEN_HERE"
 YOUR_USER_ID = "discord_user_id_here"  # Your Discord ID
 DATA_FOLDER = Path("multi_server_data")
 DATA_FOLDER.mkdir(exist_ok=True)
+ARCHIVE_ATTACHMENTS = False  # Download attachments before their URLs expire
+JSON_BACKEND = None  # "orjson", "msgspec", "stdlib" or None for the fastest installed
+PRETTY_JSON = False  # Indented files are easier to read but larger and slower
+LOW_MEMORY_MODE = False  # Skip member/message caches and unused intents (large servers)
+TRACK_REVISIONS = False  # Keep earlier versions of edited messages
+EVENT_SINK = None  # Stream events: "file", "unix:/path/to.sock" or "redis://localhost:6379/stream"
 
 # Setup intents
 intents = discord.Intents.default()
@@ -22,11 +38,23 @@ intents.message_content = True
 intents.members = True
 intents.guilds = True
 
-client = discord.Client(intents=intents)
+
+class MultiServerClient(discord.Client):
+    """Client that stops its background work before disconnecting"""
+
+    async def close(self):
+        await shutdown()
+        await super().close()
+
+
+client = MultiServerClient(**client_options(intents, LOW_MEMORY_MODE), http_trace=request_scheduler.trace_config())
+serializer = get_serializer(JSON_BACKEND, pretty=PRETTY_JSON)
+event_sink = create_sink(EVENT_SINK, DATA_FOLDER)
 
 # Store data separately for each server
 server_data: Dict[int, Dict] = {}
 server_settings: Dict[int, Dict] = {}
+reply_stats_cache = ReplyStatsCache()
 
 @client.event
 async def on_ready():
@@ -36,23 +64,35 @@ async def on_ready():
     
     for guild in client.guilds:
         print(f'   • {guild.name} (ID: {guild.id})')
-        
-        # Initialize data structure for each server
-        if guild.id not in server_data:
-            server_data[guild.id] = {
-                "guild_name": guild.name,
-                "messages": {},
-                "tracked_since": datetime.now().isoformat()
-            }
-        
-        # Default settings for each server
-        if guild.id not in server_settings:
-            server_settings[guild.id] = {
-                "tracking_enabled": True,
-                "save_replies": True,
-                "prefix": "!",
-                "allowed_channels": []  # Empty = all channels
-            }
+        setup_guild(guild)
+    
+    # Resolve replies to messages that are not in memory
+    reply_resolver.start()
+    
+    if event_sink:
+        event_sink.start()
+    
+    if attachment_archiver:
+        await attachment_archiver.start()
+
+def setup_guild(guild):
+    """Create data and default settings for a server"""
+    # Initialize data structure for each server
+    if guild.id not in server_data:
+        server_data[guild.id] = {
+            "guild_name": guild.name,
+            "messages": CowStore(),
+            "tracked_since": datetime.now().isoformat()
+        }
+    
+    # Default settings for each server
+    if guild.id not in server_settings:
+        server_settings[guild.id] = {
+            "tracking_enabled": True,
+            "save_replies": True,
+            "prefix": "!",
+            "allowed_channels": []  # Empty = all channels
+        }
 
 @client.event
 async def on_message(message):
@@ -65,7 +105,37 @@ async def on_message(message):
     if not message.guild:
         return
     
+    await ingest_message(message)
+    
+    # Process server-specific commands
+    await process_commands(message.guild.id, message)
+
+@client.event
+async def on_raw_message_edit(payload):
+    """Update tracked messages and replies when they are edited"""
+    if edit_tracker.apply_edit(payload) is not None:
+        print(f"✏️ [{payload.guild_id}] Updated edited message {payload.message_id}")
+
+@client.event
+async def on_raw_message_delete(payload):
+    """Mark tracked messages and replies as deleted"""
+    if edit_tracker.apply_delete(payload):
+        print(f"🗑️ [{payload.guild_id}] Tracked message {payload.message_id} was deleted")
+
+@client.event
+async def on_raw_bulk_message_delete(payload):
+    """Mark tracked messages removed by a purge as deleted"""
+    deleted = edit_tracker.apply_bulk_delete(payload)
+    if deleted:
+        print(f"🗑️ [{payload.guild_id}] {deleted} tracked messages were purged")
+
+async def ingest_message(message, parsed=None):
+    """Track your messages and replies to them, following server settings"""
+    if not message.guild:
+        return
+    
     guild_id = message.guild.id
+    setup_guild(message.guild)
     
     # Skip if tracking is disabled for this server
     if not server_settings[guild_id]["tracking_enabled"]:
@@ -76,56 +146,109 @@ async def on_message(message):
     if allowed_channels and message.channel.id not in allowed_channels:
         return
     
+    parsed = parsed or parse_message(message)
+    
     # Track messages from you
-    if message.author.id == YOUR_USER_ID:
-        await track_message(guild_id, message)
+    if parsed["author_id"] == YOUR_USER_ID:
+        await track_message(guild_id, message, parsed)
     
     # Track replies to your messages
     elif server_settings[guild_id]["save_replies"] and message.reference:
-        await track_reply(guild_id, message)
-    
-    # Process server-specific commands
-    await process_commands(guild_id, message)
+        await track_reply(guild_id, message, parsed)
 
-async def track_message(guild_id: int, message):
+async def track_message(guild_id: int, message, parsed=None):
     """Track a message in specific server"""
+    parsed = parsed or parse_message(message)
     message_data = {
-        "message_id": message.id,
-        "author": str(message.author),
-        "content": message.content,
-        "timestamp": message.created_at.isoformat(),
-        "channel_id": message.channel.id,
-        "channel_name": message.channel.name,
+        "message_id": parsed["id"],
+        "author": parsed["author"],
+        "content": parsed["content"],
+        "timestamp": parsed["timestamp"],
+        "channel_id": parsed["channel_id"],
+        "channel_name": parsed["channel"],
         "replies": [],
-        "attachments": [att.url for att in message.attachments]
+        "attachments": parsed["attachment_urls"],
+        "attachment_ids": parsed["attachment_ids"]
     }
     
-    server_data[guild_id]["messages"][message.id] = message_data
-    print(f"📝 [{message.guild.name}] Tracked your message in #{message.channel.name}")
+    server_data[guild_id]["messages"][parsed["id"]] = message_data
+    if event_sink:
+        event_sink.publish(message_event("message", parsed))
+    print(f"📝 [{parsed['guild']}] Tracked your message in #{parsed['channel']}")
+    
+    # Downloads happen in the archiver's own queue
+    if attachment_archiver:
+        for att in message.attachments:
+            attachment_archiver.submit(att)
 
-async def track_reply(guild_id: int, message):
+async def track_reply(guild_id: int, message, parsed=None):
     """Track a reply in specific server"""
-    try:
-        original_msg = await message.channel.fetch_message(message.reference.message_id)
-        
-        # Check if reply is to your message
-        if (original_msg.author.id == YOUR_USER_ID and 
-            original_msg.id in server_data[guild_id]["messages"]):
-            
-            reply_data = {
-                "replier": str(message.author),
-                "content": message.content,
-                "timestamp": message.created_at.isoformat()
-            }
-            
-            server_data[guild_id]["messages"][original_msg.id]["replies"].append(reply_data)
-            print(f"💬 [{message.guild.name}] Added reply from {message.author.name}")
-            
-    except Exception as e:
-        print(f"⚠️ [{message.guild.name}] Error tracking reply: {e}")
+    parsed = parsed or parse_message(message)
+    reference = message.reference
+    
+    # Replies to tracked messages need no lookup at all
+    if reference.message_id in server_data[guild_id]["messages"]:
+        add_reply(guild_id, reference.message_id, parsed)
+        return
+    
+    # The gateway usually sends the original message along with the reply
+    original_msg = reference.resolved if isinstance(reference.resolved, discord.Message) else reference.cached_message
+    if original_msg is not None:
+        await attach_resolved_reply(original_msg, message, parsed)
+    else:
+        reply_resolver.enqueue(message, attach_resolved_reply)
+
+async def attach_resolved_reply(original_msg, message, parsed=None):
+    """Attach a reply once its original message is known"""
+    guild_id = message.guild.id
+    
+    # Check if reply is to your message
+    if original_msg.author.id != YOUR_USER_ID:
+        return
+    
+    if original_msg.id not in server_data[guild_id]["messages"]:
+        await track_message(guild_id, original_msg)
+    
+    add_reply(guild_id, original_msg.id, parsed or parse_message(message))
+
+def add_reply(guild_id: int, original_id: int, parsed):
+    """Store a reply under your original message"""
+    reply_data = {
+        "id": parsed["id"],
+        "replier": parsed["author"],
+        "content": parsed["content"],
+        "timestamp": parsed["timestamp"]
+    }
+    
+    server_data[guild_id]["messages"].writable(original_id)["replies"].append(reply_data)
+    edit_tracker.index_reply(original_id, reply_data)
+    if event_sink:
+        event_sink.publish(message_event("reply", parsed))
+    print(f"💬 [{parsed['guild']}] Added reply from {parsed['author']}")
+
+def message_store(guild_id: Optional[int]) -> Optional[CowStore]:
+    """A server's tracked messages, if it has any"""
+    data = server_data.get(guild_id)
+    return data["messages"] if data else None
+
+def snapshot_guild(guild_id: int) -> Dict:
+    """Point-in-time copy of a server's data for saving"""
+    data = server_data[guild_id]
+    return {**data, "messages": data["messages"].snapshot()}
+
+reply_resolver = ReplyResolver(attach_resolved_reply, scheduler=request_scheduler)
+edit_tracker = EditTracker(message_store, keep_revisions=TRACK_REVISIONS)
+attachment_archiver = AttachmentArchiver(DATA_FOLDER / "attachments") if ARCHIVE_ATTACHMENTS else None
 
-async def process_commands(guild_id: int, message):
-    """Process commands specific to each server"""
+async def shutdown():
+    """Close downloads and connections held by background work"""
+    if event_sink:
+        await event_sink.close()
+    if attachment_archiver:
+        await attachment_archiver.close()
+
+async def process_commands(guild_id: int, message) -> bool:
+    """Process commands specific to each server, returns True if one was run"""
     prefix = server_settings[guild_id]["prefix"]
     content = message.content.lower()
     
@@ -149,6 +272,13 @@ async def process_commands(guild_id: int, message):
         
         elif command == "help":
             await show_help(guild_id, message)
+        
+        else:
+            return False
+        
+        return True
+    
+    return False
 
 async def save_server_data(guild_id: int, message):
     """Save data for specific server"""
@@ -165,34 +295,38 @@ async def save_server_data(guild_id: int, message):
     
     # Save JSON
     json_file = server_folder / f"{guild_name}_{timestamp}.json"
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(server_data[guild_id], f, indent=2, ensure_ascii=False)
+    snapshot = snapshot_guild(guild_id)
+    serializer.dump(snapshot, json_file)
     
     # Save CSV
     csv_file = server_folder / f"{guild_name}_{timestamp}.csv"
-    save_as_csv(guild_id, csv_file)
+    save_as_csv(guild_id, csv_file, snapshot["messages"])
     
     await message.channel.send(
         f"💾 **Data saved for {message.guild.name}**\n"
-        f"• Messages: {len(server_data[guild_id]['messages'])}\n"
+        f"• Messages: {len(snapshot['messages'])}\n"
         f"• Files: `{json_file.name}`, `{csv_file.name}`"
     )
 
-def save_as_csv(guild_id: int, filename: Path):
-    """Save server data as CSV"""
+def save_as_csv(guild_id: int, filename: Path, messages: Optional[Dict] = None):
+    """Save server data (or a snapshot of its messages) as CSV"""
+    if messages is None:
+        messages = server_data[guild_id]["messages"].snapshot()
+    
     with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['Message_ID', 'Channel', 'Content', 'Timestamp', 'Replies', 'Attachments']
+        fieldnames = ['Message_ID', 'Channel', 'Content', 'Timestamp', 'Replies', 'Attachments', 'Deleted']
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         
         writer.writeheader()
-        for msg_id, msg_data in server_data[guild_id]["messages"].items():
+        for msg_id, msg_data in messages.items():
             writer.writerow({
                 'Message_ID': msg_id,
                 'Channel': msg_data['channel_name'],
                 'Content': msg_data['content'][:200],
                 'Timestamp': msg_data['timestamp'],
                 'Replies': len(msg_data['replies']),
-                'Attachments': len(msg_data['attachments'])
+                'Attachments': len(msg_data['attachments']),
+                'Deleted': msg_data.get('deleted', False)
             })
 
 async def show_server_stats(guild_id: int, message):
@@ -215,13 +349,19 @@ async def show_server_stats(guild_id: int, message):
     # Create stats message
     channel_stats = "\n".join([f"   #{chan}: {count}" for chan, count in channel_counts.items()])
     
+    # Recomputed only when the server's messages change
+    latency = reply_stats_cache.get(guild_id, messages.version, messages.values(), "channel_name")
+    latency_stats = "\n".join(format_latency_lines(latency)) if latency else "No replies yet"
+    
     stats_msg = (
         f"📊 **Stats for {message.guild.name}**\n"
         f"```\n"
         f"Your Messages: {total_messages}\n"
         f"Total Replies: {total_replies}\n"
         f"Tracking Since: {server_data[guild_id]['tracked_since'][:10]}\n"
+        f"Edit Tracking: {edit_tracker.summary()}\n"
         f"\nChannels:\n{channel_stats}\n"
+        f"\nReply Timing:\n{latency_stats}\n"
         f"```"
     )
     
@@ -272,7 +412,7 @@ async def show_help(guild_id: int, message):
 # Auto-save every 100 messages per server
 async def auto_save_check():
     """Check if auto-save is needed"""
-    for guild_id, data in server_data.items():
+    for guild_id, data in list(server_data.items()):
         if len(data["messages"]) >= 100:
             server_folder = DATA_FOLDER / str(guild_id)
             server_folder.mkdir(exist_ok=True)
@@ -280,8 +420,7 @@ async def auto_save_check():
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = server_folder / f"auto_save_{timestamp}.json"
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            serializer.dump(snapshot_guild(guild_id), filename)
             
             print(f"💾 Auto-saved data for guild {guild_id}")
 
@@ -0,0 +1,153 @@
+"""
+Reply Timing Analytics
+Time to first reply, reply delay percentiles and hour-of-day patterns, computed with NumPy
+"""
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+
+
+def strip_offset(timestamp: str) -> str:
+    """Discord timestamps are UTC, so the offset carries no information"""
+    if timestamp.endswith("Z"):
+        return timestamp[:-1]
+    if len(timestamp) > 19 and timestamp[-6] in "+-" and timestamp[-3] == ":":
+        return timestamp[:-6]
+    return timestamp
+
+
+def to_datetime64(timestamps: List[str]) -> np.ndarray:
+    """Parse ISO timestamps into a NumPy array"""
+    return np.array([strip_offset(t) for t in timestamps], dtype="datetime64[us]")
+
+
+def flatten(records: Iterable[Dict], channel_key: str) -> Dict[str, np.ndarray]:
+    """Flatten messages and their replies into parallel arrays, one row per reply"""
+    message_times, reply_times, message_index, channels, repliers = [], [], [], [], []
+
+    for record in records:
+        replies = record.get("replies") or []
+        if not replies:
+            continue
+        index = len(message_times)
+        message_times.append(record["timestamp"])
+        for reply in replies:
+            reply_times.append(reply["timestamp"])
+            message_index.append(index)
+            channels.append(record.get(channel_key, ""))
+            repliers.append(reply.get("replier", ""))
+
+    sent = to_datetime64(message_times)
+    replied = to_datetime64(reply_times)
+    index = np.array(message_index, dtype=np.int64)
+
+    # Clock skew can make a reply look older than its message
+    delays = np.maximum((replied - sent[index]) / np.timedelta64(1, "s"), 0.0) if len(index) else np.zeros(0)
+
+    return {
+        "delays": delays,
+        "message_index": index,
+        "channels": np.array(channels, dtype=object),
+        "repliers": np.array(repliers, dtype=object),
+        "hours": replied.astype("datetime64[h]").astype(np.int64) % 24 if len(index) else np.zeros(0, dtype=np.int64),
+        "replied_messages": len(message_times),
+    }
+
+
+def percentiles(values: np.ndarray) -> Optional[Dict[int, float]]:
+    if not len(values):
+        return None
+    return dict(zip(PERCENTILES, np.percentile(values, PERCENTILES).tolist()))
+
+
+def grouped_percentiles(values: np.ndarray, keys: np.ndarray, top: int) -> Dict[Hashable, Dict]:
+    """Percentiles per key for the keys with the most values"""
+    names, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    order = np.argsort(inverse, kind="stable")
+    groups = np.split(values[order], np.cumsum(counts)[:-1])
+
+    busiest = np.argsort(counts)[::-1][:top]
+    return {
+        names[i]: {"count": int(counts[i]), "percentiles": percentiles(groups[i])}
+        for i in busiest
+    }
+
+
+def reply_latency_stats(records: Iterable[Dict], channel_key: str = "channel", top: int = 3) -> Optional[Dict]:
+    """Compute reply timing statistics, or None if nothing has replies"""
+    flat = flatten(records, channel_key)
+    delays = flat["delays"]
+    if not len(delays):
+        return None
+
+    # Replies are grouped by message, so the first reply is the minimum of each group
+    starts = np.flatnonzero(np.r_[True, flat["message_index"][1:] != flat["message_index"][:-1]])
+    first_reply = np.minimum.reduceat(delays, starts)
+
+    return {
+        "replies": int(len(delays)),
+        "replied_messages": flat["replied_messages"],
+        "first_reply": percentiles(first_reply),
+        "all_replies": percentiles(delays),
+        "by_channel": grouped_percentiles(delays, flat["channels"], top),
+        "by_replier": grouped_percentiles(delays, flat["repliers"], top),
+        "by_hour": np.bincount(flat["hours"], minlength=24).tolist(),
+    }
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 86400:.1f}d"
+
+
+def format_percentiles(values: Optional[Dict[int, float]]) -> str:
+    if not values:
+        return "n/a"
+    return " / ".join(format_duration(values[p]) for p in PERCENTILES)
+
+
+def format_latency_lines(stats: Dict) -> List[str]:
+    """Plain text summary shared by the !stats and /stats commands"""
+    busiest_hour = int(np.argmax(stats["by_hour"]))
+    lines = [
+        f"First Reply p50/p90/p99: {format_percentiles(stats['first_reply'])}",
+        f"All Replies p50/p90/p99: {format_percentiles(stats['all_replies'])}",
+        f"Busiest Reply Hour: {busiest_hour:02d}:00 UTC",
+        "By Channel (p50/p90/p99):",
+    ]
+    for channel, group in stats["by_channel"].items():
+        lines.append(f"  #{channel} ({group['count']}): {format_percentiles(group['percentiles'])}")
+    lines.append("By Replier (p50/p90/p99):")
+    for replier, group in stats["by_replier"].items():
+        lines.append(f"  {replier} ({group['count']}): {format_percentiles(group['percentiles'])}")
+    return lines
+
+
+class ReplyStatsCache:
+    """Keeps computed stats until the caller's data version changes, for the most recently used keys"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, version: int, records: Iterable[Dict], channel_key: str = "channel") -> Optional[Dict]:
+        cached = self.entries.get(key)
+        if cached is not None and cached[0] == version:
+            self.entries.move_to_end(key)
+            return cached[1]
+
+        stats = reply_latency_stats(records, channel_key)
+        self.entries[key] = (version, stats)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return stats
@@ -0,0 +1,180 @@
+"""
+Batched Reply Resolver
+Resolves replies to messages that are not in memory with a few history calls
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import discord
+
+from rest_scheduler import HISTORY_PAGE, REPLY, RestScheduler
+
+OnResolved = Callable[[discord.Message, discord.Message], Awaitable[None]]
+
+
+class ReplyResolver:
+    """Queues unresolved reply references per channel and resolves them in batches
+
+    Several bots can share one resolver by passing their own callback to
+    enqueue(), so a reference they all wait for costs a single lookup.
+    """
+
+    def __init__(
+        self,
+        on_resolved: Optional[OnResolved] = None,
+        max_pending: int = 500,
+        interval: float = 5.0,
+        max_requests_per_channel: int = 3,
+        max_failures: int = 3,
+        scheduler: Optional[RestScheduler] = None
+    ):
+        self.on_resolved = on_resolved
+        self.scheduler = scheduler  # History calls queue behind interactive requests when set
+        self.max_pending = max_pending
+        self.interval = interval
+        self.max_requests_per_channel = max_requests_per_channel
+        self.max_failures = max_failures  # Failed flushes in a row before a channel's replies are dropped
+
+        # channel_id -> {referenced message id -> (reply, callback) waiting for it}
+        self.pending: Dict[int, Dict[int, List[Tuple[discord.Message, OnResolved]]]] = {}
+        self.channels: Dict[int, discord.abc.Messageable] = {}
+        self.failures: Dict[int, int] = {}
+        self.task = None
+        self.stats = {"queued": 0, "resolved": 0, "dropped": 0, "requests": 0}
+
+    def pending_count(self) -> int:
+        """Number of replies waiting for their original message"""
+        return sum(len(replies) for refs in self.pending.values() for replies in refs.values())
+
+    def enqueue(self, message: discord.Message, on_resolved: Optional[OnResolved] = None) -> bool:
+        """Queue a reply whose original message is not in memory, returns False if it was skipped"""
+        on_resolved = on_resolved or self.on_resolved
+        reference = message.reference
+        if reference is None or reference.message_id is None:
+            return False
+
+        # Cross-channel references cannot share a history window with this channel
+        if reference.channel_id != message.channel.id:
+            self.stats["dropped"] += 1
+            return False
+
+        entry = (message, on_resolved)
+        refs = self.pending.get(message.channel.id, {})
+        if entry in refs.get(reference.message_id, ()):
+            return True
+
+        if self.pending_count() >= self.max_pending:
+            self.stats["dropped"] += 1
+            print(f"⚠️ Reply lookup queue is full, skipping reply {message.id}")
+            return False
+
+        refs = self.pending.setdefault(message.channel.id, {})
+        refs.setdefault(reference.message_id, []).append(entry)
+        self.channels[message.channel.id] = message.channel
+        self.stats["queued"] += 1
+        return True
+
+    def start(self):
+        """Start the background resolver (safe to call on every reconnect)"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        """Resolve queued references every few seconds"""
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        """Resolve everything currently queued"""
+        for channel_id in list(self.pending):
+            refs = self.pending.pop(channel_id, None)
+            channel = self.channels.pop(channel_id, None)
+            if not refs or channel is None:
+                continue
+
+            try:
+                await self.resolve_channel(channel, refs)
+                self.failures.pop(channel_id, None)
+            except (discord.Forbidden, discord.NotFound):
+                self.failures.pop(channel_id, None)
+                self.stats["dropped"] += sum(len(replies) for replies in refs.values())
+                print(f"⚠️ Cannot read history in channel {channel_id}")
+            except Exception as e:
+                # Server errors and timeouts pass, so what was not handled yet is tried again
+                failures = self.failures.get(channel_id, 0) + 1
+                if failures >= self.max_failures:
+                    self.failures.pop(channel_id, None)
+                    self.stats["dropped"] += sum(len(replies) for replies in refs.values())
+                    print(f"❌ Giving up on replies in channel {channel_id}: {e}")
+                else:
+                    self.failures[channel_id] = failures
+                    self.requeue(channel, refs)
+                    print(f"⚠️ Error resolving replies in channel {channel_id}, retrying: {e}")
+
+    def requeue(self, channel, refs: Dict[int, List[Tuple[discord.Message, OnResolved]]]):
+        """Put references back for the next flush"""
+        if not refs:
+            return
+        pending = self.pending.setdefault(channel.id, {})
+        for ref_id, replies in refs.items():
+            pending.setdefault(ref_id, []).extend(replies)
+        self.channels[channel.id] = channel
+
+    async def resolve_channel(self, channel, refs: Dict[int, List[Tuple[discord.Message, OnResolved]]]):
+        """Walk forward from the oldest pending id, one history page at a time
+
+        Handled references are removed from refs, so after an error it holds
+        exactly the ones still waiting.
+        """
+        remaining = sorted(refs)
+        requests = 0
+
+        while remaining and requests < self.max_requests_per_channel:
+            fetched = await self.fetch_window(channel, remaining[0])
+            requests += 1
+            self.stats["requests"] += 1
+
+            # A short page means we reached the newest message in the channel
+            covered_up_to = max(fetched) if len(fetched) == HISTORY_PAGE else None
+
+            still_pending = []
+            for ref_id in remaining:
+                original = fetched.get(ref_id)
+                if original is not None:
+                    for reply, on_resolved in refs.pop(ref_id):
+                        try:
+                            await on_resolved(original, reply)
+                            self.stats["resolved"] += 1
+                        except Exception as e:
+                            print(f"❌ Error attaching resolved reply: {e}")
+                elif covered_up_to is None or ref_id <= covered_up_to:
+                    # Inside the fetched range but missing, so it was deleted
+                    self.stats["dropped"] += len(refs.pop(ref_id))
+                else:
+                    still_pending.append(ref_id)
+            remaining = still_pending
+
+        # Anything left waits for the next flush
+        self.requeue(channel, refs)
+
+    async def fetch_window(self, channel, first_id: int) -> Dict[int, discord.Message]:
+        """One history page starting at first_id, through the scheduler if there is one"""
+        if self.scheduler is None:
+            return await self.read_window(channel, first_id)
+
+        guild_id = channel.guild.id if getattr(channel, "guild", None) else 0
+        async with self.scheduler.request(REPLY, guild_id):
+            return await self.read_window(channel, first_id)
+
+    @staticmethod
+    async def read_window(channel, first_id: int) -> Dict[int, discord.Message]:
+        fetched = {}
+        async for msg in channel.history(
+            limit=HISTORY_PAGE,
+            after=discord.Object(id=first_id - 1),
+            oldest_first=True
+        ):
+            fetched[msg.id] = msg
+        return fetched
@@ -0,0 +1,235 @@
+"""
+Priority REST Scheduler
+Orders REST calls by priority with a fair share per guild, paced by Discord's rate-limit headers
+
+Interactive requests (command replies, interaction follow-ups) are never queued:
+anything sent outside a scheduled request counts as interactive and only takes
+up capacity. Reply lookups and backfills wait their turn, back off when their
+rate-limit bucket runs low and always leave room for interactive traffic.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import aiohttp
+import discord
+
+INTERACTIVE = 0
+REPLY = 1
+BACKFILL = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", REPLY: "reply", BACKFILL: "backfill"}
+
+# Discord returns at most 100 messages per history request
+HISTORY_PAGE = 100
+
+# Priority of the scheduled request running in the current task, None for unscheduled ones
+current_priority = contextvars.ContextVar("current_priority", default=None)
+
+
+class RestScheduler:
+    """Grants REST request slots by priority, round-robin across guilds within a priority"""
+
+    def __init__(self, max_concurrent: int = 4, interactive_slots: int = 1,
+                 reserves: Optional[Dict[int, int]] = None):
+        self.max_concurrent = max_concurrent
+        self.interactive_slots = interactive_slots  # Never used by reply lookups or backfills
+        # Bucket requests left untouched for higher priorities before a class pauses
+        self.reserves = reserves or {INTERACTIVE: 0, REPLY: 0, BACKFILL: 2}
+
+        # priority -> guild_id -> waiting (future, enqueued at)
+        self.queues: Dict[int, "OrderedDict[int, Deque[Tuple[asyncio.Future, float]]]"] = {
+            priority: OrderedDict() for priority in PRIORITY_NAMES
+        }
+        self.active = {priority: 0 for priority in PRIORITY_NAMES}
+        self.next_start = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.global_pause_until = 0.0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {
+            name: {"requests": 0, "waited": 0.0, "max_wait": 0.0, "rate_limited": 0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def depth(self, priority: int) -> int:
+        return sum(len(waiting) for waiting in self.queues[priority].values())
+
+    def blocked_until(self, priority: int, now: float) -> float:
+        """When this class may start its next request by pacing alone"""
+        if priority == INTERACTIVE:
+            return now
+        return max(self.next_start[priority], self.global_pause_until)
+
+    def has_capacity(self, priority: int) -> bool:
+        total = sum(self.active.values())
+        if priority == INTERACTIVE:
+            return total < self.max_concurrent
+        background = total - self.active[INTERACTIVE]
+        return total < self.max_concurrent and background < self.max_concurrent - self.interactive_slots
+
+    def pump(self):
+        """Start every waiting request that priority, capacity and pacing allow"""
+        self.timer = None
+        now = time.monotonic()
+        wake_at = None
+
+        for priority in sorted(self.queues):
+            queue = self.queues[priority]
+            while queue:
+                if not self.has_capacity(priority):
+                    # Lower classes must not take the slot this one is waiting for
+                    self.schedule(wake_at, now)
+                    return
+
+                start_at = self.blocked_until(priority, now)
+                if start_at > now:
+                    wake_at = start_at if wake_at is None else min(wake_at, start_at)
+                    break
+
+                # Round-robin: serve the guild at the front, then move it to the back
+                guild_id, waiting = next(iter(queue.items()))
+                future, enqueued = waiting.popleft()
+                if waiting:
+                    queue.move_to_end(guild_id)
+                else:
+                    del queue[guild_id]
+
+                if future.done():
+                    continue
+                self.grant(priority, now - enqueued)
+                future.set_result(None)
+
+        self.schedule(wake_at, now)
+
+    def schedule(self, wake_at: Optional[float], now: float):
+        if wake_at is not None and self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(wake_at - now, self.pump)
+
+    def grant(self, priority: int, waited: float):
+        self.active[priority] += 1
+        stats = self.stats[PRIORITY_NAMES[priority]]
+        stats["requests"] += 1
+        stats["waited"] += waited
+        stats["max_wait"] = max(stats["max_wait"], waited)
+
+    async def acquire(self, priority: int, guild_id: int = 0):
+        now = time.monotonic()
+        if not self.depth(priority) and self.has_capacity(priority) and self.blocked_until(priority, now) <= now:
+            self.grant(priority, 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self.queues[priority].setdefault(guild_id, deque()).append((future, now))
+        self.pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled, hand the slot on
+                self.release(priority)
+            raise
+
+    def release(self, priority: int):
+        self.active[priority] -= 1
+        self.pump()
+
+    @asynccontextmanager
+    async def request(self, priority: int, guild_id: int = 0) -> AsyncIterator[None]:
+        """Hold a request slot; REST calls inside are paced by their own rate-limit headers"""
+        await self.acquire(priority, guild_id)
+        token = current_priority.set(priority)
+        try:
+            yield
+        finally:
+            current_priority.reset(token)
+            self.release(priority)
+
+    async def history(self, channel: discord.abc.Messageable, limit: int,
+                      priority: int = BACKFILL) -> AsyncIterator[discord.Message]:
+        """Channel history newest first, one scheduled request per page"""
+        guild_id = channel.guild.id if getattr(channel, "guild", None) else 0
+        before = None
+
+        while limit > 0:
+            page_size = min(limit, HISTORY_PAGE)
+            async with self.request(priority, guild_id):
+                page = [message async for message in channel.history(limit=page_size, before=before)]
+
+            # The slot is released before the caller processes the page
+            for message in page:
+                yield message
+
+            if len(page) < page_size:
+                return
+            limit -= len(page)
+            before = page[-1]
+
+    def observe(self, priority: int, status: int, headers):
+        """Pace a class from the rate-limit headers of its latest response"""
+        now = time.monotonic()
+        stats = self.stats[PRIORITY_NAMES[priority]]
+
+        if status == 429:
+            stats["rate_limited"] += 1
+            retry_after = float(headers.get("Retry-After", 1))
+            if headers.get("X-RateLimit-Global"):
+                self.global_pause_until = now + retry_after
+            else:
+                self.next_start[priority] = now + retry_after
+        elif priority != INTERACTIVE:
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset_after = headers.get("X-RateLimit-Reset-After")
+            if remaining is not None and reset_after is not None:
+                remaining, reset_after = int(remaining), float(reset_after)
+                if remaining <= self.reserves[priority]:
+                    # Leave the rest of this window to higher priorities
+                    self.next_start[priority] = now + reset_after
+                elif priority == BACKFILL:
+                    # Spread what is left over the window instead of bursting through it
+                    self.next_start[priority] = now + reset_after / remaining
+                else:
+                    self.next_start[priority] = now
+
+        self.pump()
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """aiohttp hooks for discord.Client(http_trace=...) that count and pace every request"""
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            context.priority = current_priority.get()
+            if context.priority is None:
+                self.active[INTERACTIVE] += 1
+
+        async def on_request_done(session, context, params):
+            priority = context.priority
+            if priority is None:
+                self.active[INTERACTIVE] -= 1
+                self.stats["interactive"]["requests"] += 1
+            response = getattr(params, "response", None)
+            if response is not None:
+                self.observe(INTERACTIVE if priority is None else priority, response.status, response.headers)
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_done)
+        trace.on_request_exception.append(on_request_done)
+        return trace
+
+    def summary_lines(self) -> List[str]:
+        """Queue depth and wait times per priority class"""
+        lines = []
+        for priority, name in PRIORITY_NAMES.items():
+            stats = self.stats[name]
+            average = stats["waited"] / stats["requests"] if stats["requests"] else 0.0
+            lines.append(
+                f"{name:<12} queued {self.depth(priority):>3}  active {self.active[priority]}  "
+                f"requests {stats['requests']:>5}  wait avg {average:.2f}s max {stats['max_wait']:.2f}s  "
+                f"429s {stats['rate_limited']}"
+            )
+        return lines
+
+
+# One scheduler per process, shared by every bot running on its connection
+request_scheduler = RestScheduler()
@@ -0,0 +1,101 @@
+"""
+Serializers
+JSON encoding for save, export and backup files with optional fast backends
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Fastest first; used when no backend is requested
+PREFERRED_BACKENDS = ("msgspec", "orjson", "stdlib")
+
+
+class Serializer:
+    """Standard library json encoder, always available"""
+
+    name = "stdlib"
+
+    def __init__(self, pretty: bool = False):
+        self.pretty = pretty
+
+    def dumps(self, obj: Any) -> bytes:
+        if self.pretty:
+            text = json.dumps(obj, indent=2, ensure_ascii=False, default=str)
+        else:
+            text = json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str)
+        return text.encode('utf-8')
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+    def dump(self, obj: Any, filename: Path):
+        """Encode and write a whole file in one call"""
+        with open(filename, 'wb') as f:
+            f.write(self.dumps(obj))
+
+
+class OrjsonSerializer(Serializer):
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        # Message ids are used as int dict keys throughout the bots
+        option = orjson.OPT_NON_STR_KEYS
+        if self.pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option, default=str)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgspecSerializer(Serializer):
+    name = "msgspec"
+
+    def __init__(self, pretty: bool = False):
+        super().__init__(pretty)
+        self.encoder = msgspec.json.Encoder(enc_hook=str)
+        self.decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj: Any) -> bytes:
+        data = self.encoder.encode(obj)
+        if self.pretty:
+            data = msgspec.json.format(data, indent=2)
+        return data
+
+    def loads(self, data: bytes) -> Any:
+        return self.decoder.decode(data)
+
+
+BACKENDS = {
+    "stdlib": (Serializer, True),
+    "orjson": (OrjsonSerializer, orjson is not None),
+    "msgspec": (MsgspecSerializer, msgspec is not None),
+}
+
+
+def available_backends():
+    """Names of the backends that can be used in this environment"""
+    return [name for name in PREFERRED_BACKENDS if BACKENDS[name][1]]
+
+
+def get_serializer(backend: Optional[str] = None, pretty: bool = False) -> Serializer:
+    """Return the requested backend, falling back to the fastest installed one"""
+    if backend is not None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown serializer backend: {backend}")
+        if BACKENDS[backend][1]:
+            return BACKENDS[backend][0](pretty)
+        print(f"⚠️ {backend} is not installed, falling back to {available_backends()[0]}")
+
+    return BACKENDS[available_backends()[0]][0](pretty)
@@ -5,26 +5,52 @@ Collects only your messages and replies with basic commands
 
 import discord
 import csv
-import json
 from datetime import datetime
 from pathlib import Path
 
+from edit_tracker import EditTracker
+from event_sinks import create_sink, message_event
+from ingestion import parse_message
+from memory_budget import client_options
+from reply_analytics import ReplyStatsCache, format_latency_lines
+from reply_resolver import ReplyResolver
+from rest_scheduler import request_scheduler
+from serializers import get_serializer
+from snapshots import CowStore
+
 # Configuration
 TOKEN = "YOUR_BOT_TOKEN_HERE"
 YOUR_USER_ID = "Your Discord ID"  # Your Discord ID
 DATA_FOLDER = Path("collected_data")
 DATA_FOLDER.mkdir(exist_ok=True)
+JSON_BACKEND = None  # "orjson", "msgspec", "stdlib" or None for the fastest installed
+PRETTY_JSON = False  # Indented files are easier to read but larger and slower
+LOW_MEMORY_MODE = False  # Skip member/message caches and unused intents (large servers)
+TRACK_REVISIONS = False  # Keep earlier versions of edited messages
+EVENT_SINK = None  # Stream events: "file", "unix:/path/to.sock" or "redis://localhost:6379/stream"
 
 # Setup intents
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
-client = discord.Client(intents=intents)
+
+class SingleServerClient(discord.Client):
+    """Client that stops its background work before disconnecting"""
+
+    async def close(self):
+        await shutdown()
+        await super().close()
+
+
+client = SingleServerClient(**client_options(intents, LOW_MEMORY_MODE), http_trace=request_scheduler.trace_config())
+serializer = get_serializer(JSON_BACKEND, pretty=PRETTY_JSON)
+event_sink = create_sink(EVENT_SINK, DATA_FOLDER)
 
 # Store data in memory
-chat_history = {}
+chat_history = CowStore()
 server_info = {}
+reply_stats_cache = ReplyStatsCache()
 
 @client.event
 async def on_ready():
@@ -35,6 +61,12 @@ async def on_ready():
     # Save any existing data on startup
     save_data_json()
     save_data_csv()
+    
+    # Resolve replies to messages that are not in memory
+    reply_resolver.start()
+    
+    if event_sink:
+        event_sink.start()
 
 @client.event
 async def on_message(message):
@@ -43,35 +75,72 @@ async def on_message(message):
     if message.author == client.user:
         return
     
-    # Only track messages from you or replies to your messages
-    if message.author.id == YOUR_USER_ID:
-        await track_your_message(message)
+    await ingest_message(message)
+    await handle_command(message)
+
+@client.event
+async def on_raw_message_edit(payload):
+    """Update tracked messages and replies when they are edited"""
+    record = edit_tracker.apply_edit(payload)
+    if record is not None:
+        print(f"✏️ Updated edited message: {record['content'][:50]}...")
+
+@client.event
+async def on_raw_message_delete(payload):
+    """Mark tracked messages and replies as deleted"""
+    if edit_tracker.apply_delete(payload):
+        print(f"🗑️ Tracked message {payload.message_id} was deleted")
+
+@client.event
+async def on_raw_bulk_message_delete(payload):
+    """Mark tracked messages removed by a purge as deleted"""
+    deleted = edit_tracker.apply_bulk_delete(payload)
+    if deleted:
+        print(f"🗑️ {deleted} tracked messages were purged")
+
+async def ingest_message(message, parsed=None):
+    """Track messages from you or replies to your messages"""
+    parsed = parsed or parse_message(message)
+    
+    if parsed["author_id"] == YOUR_USER_ID:
+        await track_your_message(message, parsed)
     elif message.reference:
-        await track_reply_to_you(message)
+        await track_reply_to_you(message, parsed)
+
+async def handle_command(message) -> bool:
+    """Answer basic commands, returns True if the message was one"""
+    content = message.content.lower()
     
-    # Basic commands
-    if message.content.lower() == "!hello":
+    if content == "!hello":
         await message.channel.send(f"Hello {message.author.name}! I'm tracking your messages.")
     
-    elif message.content.lower() == "!save":
+    elif content == "!save":
         await save_and_confirm(message)
     
-    elif message.content.lower() == "!stats":
+    elif content == "!stats":
         await show_stats(message)
+    
+    else:
+        return False
+    
+    return True
 
-async def track_your_message(message):
+async def track_your_message(message, parsed=None):
     """Track messages sent by you"""
+    parsed = parsed or parse_message(message)
     message_data = {
-        "message_id": message.id,
-        "author": str(message.author),
-        "content": message.content,
-        "timestamp": message.created_at.isoformat(),
-        "channel": message.channel.name,
+        "message_id": parsed["id"],
+        "author": parsed["author"],
+        "content": parsed["content"],
+        "timestamp": parsed["timestamp"],
+        "channel": parsed["channel"],
         "replies": []
     }
     
-    chat_history[message.id] = message_data
-    print(f"📝 Tracked your message in #{message.channel.name}: {message.content[:50]}...")
+    chat_history[parsed["id"]] = message_data
+    if event_sink:
+        event_sink.publish(message_event("message", parsed))
+    print(f"📝 Tracked your message in #{parsed['channel']}: {parsed['content'][:50]}...")
     
     # Save server info if not already saved
     if message.guild and message.guild.id not in server_info:
@@ -82,27 +151,56 @@ async def track_your_message(message):
             "first_tracked": datetime.now().isoformat()
         }
 
-async def track_reply_to_you(message):
+async def track_reply_to_you(message, parsed=None):
     """Track replies to your messages"""
-    try:
-        # Get the message being replied to
-        original_msg = await message.channel.fetch_message(message.reference.message_id)
-        
-        # Check if it's a reply to YOUR message
-        if original_msg.author.id == YOUR_USER_ID and original_msg.id in chat_history:
-            reply_data = {
-                "replier": str(message.author),
-                "content": message.content,
-                "timestamp": message.created_at.isoformat()
-            }
-            
-            chat_history[original_msg.id]["replies"].append(reply_data)
-            print(f"💬 Added reply to your message from {message.author.name}")
-            
-    except discord.NotFound:
-        print("⚠️ Original message not found for reply")
-    except Exception as e:
-        print(f"❌ Error tracking reply: {e}")
+    parsed = parsed or parse_message(message)
+    reference = message.reference
+    
+    # Replies to tracked messages need no lookup at all
+    if reference.message_id in chat_history:
+        add_reply(reference.message_id, parsed)
+        return
+    
+    # The gateway usually sends the original message along with the reply
+    original_msg = reference.resolved if isinstance(reference.resolved, discord.Message) else reference.cached_message
+    if original_msg is not None:
+        await attach_resolved_reply(original_msg, message, parsed)
+    else:
+        reply_resolver.enqueue(message, attach_resolved_reply)
+
+async def attach_resolved_reply(original_msg, message, parsed=None):
+    """Attach a reply once its original message is known"""
+    # Check if it's a reply to YOUR message
+    if original_msg.author.id != YOUR_USER_ID:
+        return
+    
+    if original_msg.id not in chat_history:
+        await track_your_message(original_msg)
+    
+    add_reply(original_msg.id, parsed or parse_message(message))
+
+def add_reply(original_id, parsed):
+    """Store a reply under your original message"""
+    reply_data = {
+        "id": parsed["id"],
+        "replier": parsed["author"],
+        "content": parsed["content"],
+        "timestamp": parsed["timestamp"]
+    }
+    
+    chat_history.writable(original_id)["replies"].append(reply_data)
+    edit_tracker.index_reply(original_id, reply_data)
+    if event_sink:
+        event_sink.publish(message_event("reply", parsed))
+    print(f"💬 Added reply to your message from {parsed['author']}")
+
+reply_resolver = ReplyResolver(attach_resolved_reply, scheduler=request_scheduler)
+edit_tracker = EditTracker(lambda guild_id: chat_history, keep_revisions=TRACK_REVISIONS)
+
+async def shutdown():
+    """Deliver or save queued events before disconnecting"""
+    if event_sink:
+        await event_sink.close()
 
 async def save_and_confirm(message):
     """Save data and send confirmation"""
@@ -141,6 +239,10 @@ async def show_stats(message):
     
     channel_stats = "\n".join([f"  • #{chan}: {count} msgs" for chan, count in channels.items()])
     
+    # Recomputed only when the stored messages change
+    latency = reply_stats_cache.get("all", chat_history.version, chat_history.values())
+    latency_stats = "\n".join(format_latency_lines(latency)) if latency else "No replies yet"
+    
     stats_msg = (
         f"📊 **Data Collection Stats**\n"
         f"```\n"
@@ -149,6 +251,8 @@ async def show_stats(message):
         f"Date Range: {earliest} to {latest}\n"
         f"Channels Tracked: {len(channels)}\n"
         f"{channel_stats}\n"
+        f"Edit Tracking: {edit_tracker.summary()}\n"
+        f"\nReply Timing:\n{latency_stats}\n"
         f"```"
     )
     
@@ -160,17 +264,17 @@ def save_data_json():
         return
     
     filename = DATA_FOLDER / f"chat_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    messages = chat_history.snapshot()
     
     data_to_save = {
         "server_info": server_info,
-        "your_messages": chat_history,
+        "your_messages": messages,
         "export_time": datetime.now().isoformat(),
-        "total_messages": len(chat_history),
-        "total_replies": sum(len(msg["replies"]) for msg in chat_history.values())
+        "total_messages": len(messages),
+        "total_replies": sum(len(msg["replies"]) for msg in messages.values())
     }
     
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data_to_save, f, indent=2, ensure_ascii=False)
+    serializer.dump(data_to_save, filename)
     
     print(f"💾 Saved JSON data to {filename}")
 
@@ -182,18 +286,19 @@ def save_data_csv():
     filename = DATA_FOLDER / f"chat_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
     with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['Message_ID', 'Author', 'Content', 'Timestamp', 'Channel', 'Reply_Count']
+        fieldnames = ['Message_ID', 'Author', 'Content', 'Timestamp', 'Channel', 'Reply_Count', 'Deleted']
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         
         writer.writeheader()
-        for msg_id, msg_data in chat_history.items():
+        for msg_id, msg_data in chat_history.snapshot().items():
             writer.writerow({
                 'Message_ID': msg_id,
                 'Author': msg_data['author'],
                 'Content': msg_data['content'][:500],  # Limit length
                 'Timestamp': msg_data['timestamp'],
                 'Channel': msg_data['channel'],
-                'Reply_Count': len(msg_data['replies'])
+                'Reply_Count': len(msg_data['replies']),
+                'Deleted': msg_data.get('deleted', False)
             })
     
     print(f"💾 Saved CSV data to {filename}")
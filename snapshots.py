@@ -0,0 +1,122 @@
+"""
+Copy-on-Write Snapshots
+Message stores whose point-in-time snapshots cost O(1) and never block ingestion
+"""
+
+from itertools import count, islice
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+# Shared by every store, so a replaced store never repeats an old store's version
+write_counter = count(1)
+
+
+def copy_record(record: Dict) -> Dict:
+    """Copy a record deep enough that changing the copy leaves the original alone"""
+    copied = dict(record)
+    for field, value in record.items():
+        if isinstance(value, list):
+            # replies, revisions, attachment lists
+            copied[field] = [dict(item) if isinstance(item, dict) else item for item in value]
+    return copied
+
+
+class CowStore:
+    """Records by message id, in arrival order, with generation-based copy-on-write
+
+    snapshot() hands out the current dict and starts a new generation. The next
+    write copies the dict (not the records) first, and a record from an older
+    generation is copied the first time it is changed, so a snapshot never
+    changes while an exporter reads it. Records must be changed through
+    writable(), never through a reference obtained before.
+
+    `version` takes a new value on every write, including each writable()
+    call, so caches keyed on it notice any change to the records.
+    """
+
+    def __init__(self, records: Iterable[Tuple[Hashable, Dict]] = ()):
+        self.records: Dict[Hashable, Dict] = dict(records)
+        self.generation = 0
+        self.shared = False
+        self.version = next(write_counter)
+        # message id -> generation the record was created or last copied in
+        self.born: Dict[Hashable, int] = dict.fromkeys(self.records, 0)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.records
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.records)
+
+    def __getitem__(self, key: Hashable) -> Dict:
+        return self.records[key]
+
+    def get(self, key: Hashable, default=None):
+        return self.records.get(key, default)
+
+    def keys(self):
+        return self.records.keys()
+
+    def values(self):
+        return self.records.values()
+
+    def items(self):
+        return self.records.items()
+
+    def snapshot(self) -> Dict[Hashable, Dict]:
+        """Point-in-time view of every record; treat it as read-only"""
+        self.shared = True
+        self.generation += 1
+        return self.records
+
+    def own(self):
+        """Stop sharing the dict with snapshots before writing to it"""
+        if self.shared:
+            self.records = dict(self.records)
+            self.shared = False
+
+    def __setitem__(self, key: Hashable, record: Dict):
+        self.own()
+        self.records[key] = record
+        self.born[key] = self.generation
+        self.version = next(write_counter)
+
+    def writable(self, key: Hashable) -> Optional[Dict]:
+        """A record that may be changed in place, copied first if a snapshot can see it"""
+        record = self.records.get(key)
+        if record is not None:
+            self.version = next(write_counter)
+            if self.born.get(key) != self.generation:
+                record = copy_record(record)
+                self[key] = record
+        return record
+
+    def pop(self, key: Hashable, default=None):
+        self.own()
+        self.version = next(write_counter)
+        self.born.pop(key, None)
+        return self.records.pop(key, default)
+
+    def trim(self, keep: int) -> List[Dict]:
+        """Drop the oldest records beyond `keep`, returns what was dropped"""
+        excess = len(self.records) - keep
+        if excess <= 0:
+            return []
+
+        dropped_keys = list(islice(self.records, excess))
+        dropped = [self.records[key] for key in dropped_keys]
+        self.own()
+        self.version = next(write_counter)
+        for key in dropped_keys:
+            del self.records[key]
+            del self.born[key]
+        return dropped
+
+    def clear(self):
+        # Snapshots keep the old dict, so there is nothing to copy
+        self.records = {}
+        self.born = {}
+        self.shared = False
+        self.version = next(write_counter)
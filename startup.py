@@ -0,0 +1,133 @@
+"""
+Startup Helpers
+Fingerprint-cached slash command sync, single-instance background tasks and ready timing
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+import discord
+from discord import app_commands
+
+
+def command_tree_fingerprint(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """Hash the payload Discord would receive for a sync"""
+    payload = []
+    for command in tree.get_commands(guild=guild):
+        try:
+            payload.append(command.to_dict(tree))
+        except TypeError:
+            # discord.py < 2.4 takes no tree argument
+            payload.append(command.to_dict())
+
+    payload.sort(key=lambda c: (c.get("type", 1), c["name"]))
+    encoded = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+async def sync_commands(tree: app_commands.CommandTree, cache_file: Path,
+                        guild_id: Optional[int] = None, force: bool = False) -> Optional[int]:
+    """Sync the command tree only when it changed since the last successful sync
+
+    With guild_id set, global commands are copied to that guild and synced there,
+    which applies instantly and is meant for development.
+    Returns the number of synced commands, or None if the sync was skipped.
+    """
+    guild = discord.Object(id=guild_id) if guild_id else None
+    if guild is not None:
+        tree.copy_global_to(guild=guild)
+
+    scope = f"{tree.client.application_id}:{guild_id or 'global'}"
+    fingerprint = command_tree_fingerprint(tree, guild)
+
+    cache = load_sync_cache(cache_file)
+    if not force and cache.get(scope) == fingerprint:
+        return None
+
+    synced = await tree.sync(guild=guild)
+
+    cache[scope] = fingerprint
+    tmp_file = cache_file.with_suffix(".tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_file, cache_file)
+
+    return len(synced)
+
+
+def load_sync_cache(cache_file: Path) -> Dict[str, str]:
+    """Fingerprints of the last syncs; an unreadable file just means syncing again"""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable command sync cache {cache_file.name}: {e}")
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+class TaskSupervisor:
+    """Keeps exactly one running instance of each named background task"""
+
+    def __init__(self):
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    def ensure(self, name: str, factory: Callable[[], Awaitable]) -> bool:
+        """Start the task unless it is already running, returns True if started"""
+        task = self.tasks.get(name)
+        if task is not None and not task.done():
+            return False
+
+        task = asyncio.create_task(factory(), name=name)
+        task.add_done_callback(self.report)
+        self.tasks[name] = task
+        return True
+
+    def report(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"❌ Background task {task.get_name()} crashed: {task.exception()}")
+
+    def cancel(self, name: str):
+        task = self.tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+
+    def cancel_all(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+
+
+class ReadyTimer:
+    """Measures time from process start (or last disconnect) to ready"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.disconnected: Optional[float] = None
+        self.metrics = {"time_to_ready": None, "last_reconnect": None, "ready_count": 0}
+
+    def mark_disconnect(self):
+        if self.disconnected is None:
+            self.disconnected = time.perf_counter()
+
+    def mark_ready(self) -> float:
+        """Record a ready event and return how long it took"""
+        now = time.perf_counter()
+        self.metrics["ready_count"] += 1
+
+        if self.metrics["time_to_ready"] is None:
+            elapsed = now - self.started
+            self.metrics["time_to_ready"] = elapsed
+        else:
+            elapsed = now - (self.disconnected or now)
+            self.metrics["last_reconnect"] = elapsed
+
+        self.disconnected = None
+        return elapsed
@@ -0,0 +1,220 @@
+"""
+Attachment Archiver Tests
+Downloads run against a local aiohttp server standing in for Discord's CDN
+"""
+
+import asyncio
+import hashlib
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from attachment_archiver import AttachmentArchiver
+
+BODY = bytes(range(256)) * 40  # 10 KiB
+
+
+def make_attachment(attachment_id, url, content_type="image/png", size=len(BODY)):
+    return SimpleNamespace(id=attachment_id, url=url, filename=f"{attachment_id}.png",
+                           content_type=content_type, size=size)
+
+
+@asynccontextmanager
+async def cdn(body=BODY, honor_range=True, status=None, stall_after=None):
+    """Serve body at /file, recording the Range header of each request
+
+    status answers every request with that status instead, and stall_after
+    sends that many bytes and then hangs, like a connection dropped mid-download.
+    """
+    ranges = []
+
+    async def serve(request):
+        requested = request.headers.get("Range")
+        ranges.append(requested)
+        if status is not None:
+            return web.Response(status=status)
+        if stall_after is not None:
+            response = web.StreamResponse()
+            response.content_length = len(body)
+            await response.prepare(request)
+            await response.write(body[:stall_after])
+            await asyncio.sleep(3600)
+        if requested and honor_range:
+            start = int(requested[len("bytes="):-1])
+            if start >= len(body):
+                return web.Response(status=416)
+            return web.Response(status=206, body=body[start:])
+        return web.Response(body=body)
+
+    app = web.Application()
+    app.router.add_get("/file", serve)
+    runner = web.AppRunner(app, shutdown_timeout=0.1)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        yield f"http://127.0.0.1:{port}/file", ranges
+    finally:
+        await runner.cleanup()
+
+
+def archive(tmp_path, attachment, part=None, honor_range=True, **options):
+    """Archive one attachment directly, optionally starting from a partial file"""
+    async def run():
+        archiver = AttachmentArchiver(tmp_path, **options)
+        async with cdn(honor_range=honor_range) as (url, ranges):
+            attachment.url = url
+            # start() removes partial files no pending job owns
+            await archiver.start()
+            if part is not None:
+                (archiver.partial / f"{attachment.id}.part").write_bytes(part)
+            try:
+                await archiver.archive({
+                    "attachment_id": str(attachment.id),
+                    "url": attachment.url,
+                    "filename": attachment.filename,
+                    "content_type": attachment.content_type
+                })
+            finally:
+                await archiver.close()
+        return archiver, ranges
+
+    return asyncio.run(run())
+
+
+def stored_bytes(archiver, attachment_id):
+    entry = archiver.manifest[str(attachment_id)]
+    return archiver.object_path(entry["sha256"]).read_bytes()
+
+
+def test_accepts_checks_size_and_type(tmp_path):
+    archiver = AttachmentArchiver(tmp_path, max_bytes=1000)
+
+    assert archiver.accepts(make_attachment(1, "", size=1000))
+    assert not archiver.accepts(make_attachment(2, "", size=1001))
+    assert not archiver.accepts(make_attachment(3, "", content_type="application/zip", size=10))
+    assert not archiver.accepts(make_attachment(4, "", content_type=None, size=10))
+    assert AttachmentArchiver(tmp_path, allowed_types=None).accepts(
+        make_attachment(5, "", content_type="application/zip", size=10))
+
+
+def test_resumes_from_partial_file(tmp_path):
+    archiver, ranges = archive(tmp_path, make_attachment(1, ""), part=BODY[:4000])
+
+    assert ranges == ["bytes=4000-"]
+    assert stored_bytes(archiver, 1) == BODY
+    assert not (archiver.partial / "1.part").exists()
+
+
+def test_complete_partial_file_is_kept_on_416(tmp_path):
+    archiver, ranges = archive(tmp_path, make_attachment(1, ""), part=BODY)
+
+    assert ranges == [f"bytes={len(BODY)}-"]
+    assert stored_bytes(archiver, 1) == BODY
+
+
+def test_restarts_when_server_ignores_range(tmp_path):
+    archiver, ranges = archive(tmp_path, make_attachment(1, ""), part=b"stale bytes", honor_range=False)
+
+    assert ranges == ["bytes=11-"]
+    assert stored_bytes(archiver, 1) == BODY
+
+
+def test_too_large_download_removes_partial_file(tmp_path):
+    async def run():
+        # Size unknown up front, so only the download itself can notice
+        archiver = AttachmentArchiver(tmp_path, max_bytes=1000)
+        async with cdn() as (url, _):
+            await archiver.start()
+            try:
+                assert archiver.submit(make_attachment(1, url, size=0))
+                await archiver.queue.join()
+            finally:
+                await archiver.close()
+        return archiver
+
+    archiver = asyncio.run(run())
+    assert archiver.stats["skipped"] == 1
+    assert "1" not in archiver.manifest
+    assert not (archiver.partial / "1.part").exists()
+    assert not any(path.is_file() for path in archiver.objects.rglob("*"))
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    async def run():
+        archiver = AttachmentArchiver(tmp_path)
+        async with cdn() as (url, _):
+            await archiver.start()
+            try:
+                assert archiver.submit(make_attachment(1, url))
+                assert archiver.submit(make_attachment(2, url))
+                await archiver.queue.join()
+            finally:
+                await archiver.close()
+        return archiver
+
+    archiver = asyncio.run(run())
+    sha256 = hashlib.sha256(BODY).hexdigest()
+    assert archiver.manifest["1"]["sha256"] == archiver.manifest["2"]["sha256"] == sha256
+    assert [path.name for path in archiver.objects.rglob("*") if path.is_file()] == [sha256]
+    assert archiver.stats == {"archived": 1, "deduplicated": 1, "skipped": 0, "failed": 0}
+    assert len(archiver.manifest_file.read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_expired_url_removes_partial_file(tmp_path):
+    async def run():
+        archiver = AttachmentArchiver(tmp_path)
+        async with cdn(status=404) as (url, ranges):
+            await archiver.start()
+            (archiver.partial / "1.part").write_bytes(BODY[:100])
+            try:
+                assert archiver.submit(make_attachment(1, url))
+                await archiver.queue.join()
+            finally:
+                await archiver.close()
+        return archiver, ranges
+
+    archiver, ranges = asyncio.run(run())
+    assert len(ranges) == 1  # Client errors are not retried
+    assert archiver.stats["failed"] == 1
+    assert not (archiver.partial / "1.part").exists()
+    assert AttachmentArchiver(tmp_path).load_pending() == []
+
+
+def test_interrupted_download_resumes_after_restart(tmp_path):
+    async def first_run():
+        archiver = AttachmentArchiver(tmp_path)
+        async with cdn(stall_after=4000) as (url, _):
+            await archiver.start()
+            assert archiver.submit(make_attachment(1, url))
+            await asyncio.sleep(0.3)
+            await archiver.close()
+        return url
+
+    async def second_run():
+        archiver = AttachmentArchiver(tmp_path)
+        async with cdn() as (url, ranges):
+            # Same job, served from the new address
+            jobs = archiver.load_pending()
+            jobs[0]["url"] = url
+            archiver.write_pending(jobs)
+            await archiver.start()
+            try:
+                await archiver.queue.join()
+            finally:
+                await archiver.close()
+        return archiver, ranges
+
+    asyncio.run(first_run())
+    assert (tmp_path / "partial" / "1.part").stat().st_size == 4000
+
+    archiver, ranges = asyncio.run(second_run())
+    assert ranges == ["bytes=4000-"]
+    assert stored_bytes(archiver, 1) == BODY
+    assert archiver.load_pending() == []
@@ -0,0 +1,119 @@
+"""
+Backup Tests
+Full/differential selection, restore, retention and recovery from damaged files
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backups import BackupCorrupted, BackupManager
+
+START = datetime(2024, 5, 5, 10, 0)
+
+
+def make_records(count=4, edited=()):
+    return [{"id": n, "content": f"message {n}" + (" (edited)" if n in edited else ""), "replies": []}
+            for n in range(count)]
+
+
+def by_id(records):
+    return sorted(records, key=lambda record: record["id"])
+
+
+def test_diff_restores_to_same_records(tmp_path):
+    manager = BackupManager(tmp_path)
+    manager.backup(1, make_records(), now=START)
+
+    # One edit, one removal and one new message
+    changed = make_records(edited={0})[:3] + [{"id": 9, "content": "new", "replies": []}]
+    entry = manager.backup(1, changed, now=START + timedelta(hours=1))
+
+    assert entry["kind"] == "diff"
+    assert by_id(manager.restore(1)) == by_id(changed)
+    assert by_id(manager.restore(1, at=START)) == make_records()
+    # A fresh manager reads everything back from disk
+    assert by_id(BackupManager(tmp_path).restore(1)) == by_id(changed)
+
+
+def test_unchanged_data_is_skipped(tmp_path):
+    manager = BackupManager(tmp_path)
+    assert manager.backup(1, make_records(), now=START) is not None
+    assert manager.backup(1, make_records(), now=START + timedelta(hours=1)) is None
+    assert len(manager.entries(1)) == 1
+
+
+def test_large_change_and_full_every_write_full_backups(tmp_path):
+    manager = BackupManager(tmp_path, full_every=2)
+    manager.backup(1, make_records(), now=START)
+
+    entry = manager.backup(1, make_records(edited={0, 1, 2}), now=START + timedelta(hours=1))
+    assert entry["kind"] == "full"
+
+    kinds = [manager.backup(1, make_records(edited={n}), now=START + timedelta(hours=2 + n))["kind"]
+             for n in range(3)]
+    assert kinds == ["diff", "diff", "full"]
+
+
+def test_retention_keeps_the_base_of_kept_diffs(tmp_path):
+    manager = BackupManager(tmp_path)
+    full = manager.backup(1, make_records(), now=START)
+    early_diff = manager.backup(1, make_records(edited={0}), now=START + timedelta(minutes=30))
+    month_diff = manager.backup(1, make_records(edited={1}), now=START + timedelta(hours=1))
+
+    now = START + timedelta(days=40)
+    recent_full = manager.backup(1, make_records(edited={0, 1, 2, 3}), now=now - timedelta(hours=2))
+    recent_diff = manager.backup(1, make_records(count=5, edited={0, 1, 2, 3}), now=now - timedelta(hours=1))
+    assert [full["kind"], recent_full["kind"], recent_diff["kind"]] == ["full", "full", "diff"]
+
+    removed = manager.apply_retention(1, now=now)
+
+    # month_diff is the newest of its month and needs the first full backup
+    assert removed == [early_diff["file"]]
+    assert not (tmp_path / early_diff["file"]).exists()
+    assert [e["file"] for e in manager.entries(1)] == [
+        full["file"], month_diff["file"], recent_full["file"], recent_diff["file"]
+    ]
+    assert by_id(manager.restore(1, at=START + timedelta(hours=1))) == make_records(edited={1})
+
+
+def test_damaged_file_fails_verification(tmp_path):
+    manager = BackupManager(tmp_path)
+    entry = manager.backup(1, make_records(), now=START)
+    (tmp_path / entry["file"]).write_bytes(b"not a backup")
+
+    assert manager.verify_all() == [entry["file"]]
+    with pytest.raises(BackupCorrupted):
+        manager.restore(1)
+
+
+@pytest.mark.parametrize("damage", ["delete", "corrupt"])
+def test_unreadable_full_backup_starts_a_new_chain(tmp_path, damage):
+    manager = BackupManager(tmp_path)
+    full = manager.backup(1, make_records(), now=START)
+    if damage == "delete":
+        (tmp_path / full["file"]).unlink()
+    else:
+        (tmp_path / full["file"]).write_bytes(b"corrupted")
+
+    entry = manager.backup(1, make_records(edited={0}), now=START + timedelta(hours=1))
+    assert entry["kind"] == "full"
+    assert by_id(BackupManager(tmp_path).restore(1)) == make_records(edited={0})
+
+    # Later backups diff against the new full backup again
+    entry = manager.backup(1, make_records(edited={0, 1}), now=START + timedelta(hours=2))
+    assert entry["kind"] == "diff" and entry["base"] != full["file"]
+
+
+def test_missing_latest_backup_is_rewritten_even_if_unchanged(tmp_path):
+    manager = BackupManager(tmp_path)
+    full = manager.backup(1, make_records(), now=START)
+    (tmp_path / full["file"]).unlink()
+
+    entry = manager.backup(1, make_records(), now=START + timedelta(hours=1))
+    assert entry is not None and entry["kind"] == "full"
+    assert manager.restore(1) == make_records()
@@ -0,0 +1,82 @@
+"""
+Edit Tracker Tests
+Raw edit/delete payloads applied to a copy-on-write store
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from edit_tracker import EditTracker
+from snapshots import CowStore
+
+
+def make_tracker(**options):
+    store = CowStore([
+        (1, {"id": 1, "content": "hello", "timestamp": "2024-01-01T10:00:00", "replies": [
+            {"id": 2, "content": "hi back", "timestamp": "2024-01-01T10:01:00"}
+        ]}),
+    ])
+    tracker = EditTracker(lambda guild_id: store, **options)
+    tracker.index_replies(store.values())
+    return tracker, store
+
+
+def edit(message_id, content):
+    data = {"id": str(message_id), "edited_timestamp": "2024-01-02T00:00:00"}
+    if content is not None:
+        data["content"] = content
+    return SimpleNamespace(message_id=message_id, guild_id=None, data=data)
+
+
+def test_ignored_events_leave_the_store_untouched():
+    tracker, store = make_tracker()
+    snapshot = store.snapshot()
+    version = store.version
+
+    assert tracker.apply_edit(edit(1, None)) is None  # Embed unfurl
+    assert tracker.apply_edit(edit(1, "hello")) is None  # Same content
+    assert tracker.apply_edit(edit(99, "unknown")) is None
+    assert tracker.mark_deleted(None, 99, "2024-01-02T00:00:00") is False
+
+    assert tracker.stats["ignored"] == 4
+    assert store.version == version
+    assert store[1] is snapshot[1]
+
+
+def test_edit_updates_store_but_not_snapshot():
+    tracker, store = make_tracker(keep_revisions=True)
+    snapshot = store.snapshot()
+
+    record = tracker.apply_edit(edit(1, "hello, edited"))
+
+    assert record is store[1]
+    assert store[1]["content"] == "hello, edited"
+    assert store[1]["revisions"] == [{"content": "hello", "timestamp": "2024-01-01T10:00:00"}]
+    assert snapshot[1]["content"] == "hello"
+    assert "revisions" not in snapshot[1]
+
+
+def test_reply_edits_and_deletes_go_through_the_parent():
+    tracker, store = make_tracker()
+    snapshot = store.snapshot()
+
+    assert tracker.apply_edit(edit(2, "hi back, edited"))["content"] == "hi back, edited"
+    assert tracker.mark_deleted(None, 2, "2024-01-02T00:00:00")
+    assert not tracker.mark_deleted(None, 2, "2024-01-03T00:00:00")  # Already deleted
+
+    assert store[1]["replies"][0]["deleted"] is True
+    assert snapshot[1]["replies"][0] == {"id": 2, "content": "hi back", "timestamp": "2024-01-01T10:01:00"}
+
+
+def test_bulk_delete_marks_only_tracked_messages():
+    tracker, store = make_tracker()
+    payload = SimpleNamespace(guild_id=None, message_ids={1, 2, 99})
+
+    assert tracker.apply_bulk_delete(payload) == 2
+    assert store[1]["deleted"] and store[1]["replies"][0]["deleted"]
+
+    tracker.forget(store.trim(0))
+    assert tracker.replies == {}
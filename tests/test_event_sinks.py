@@ -0,0 +1,205 @@
+"""
+Event Sink Tests
+Queueing and spilling with an in-memory backend, plus each real backend
+against a local stand-in: a Unix socket server, a RESP server and files
+"""
+
+import asyncio
+import json
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from event_sinks import (EventSink, RedisError, RedisStreamBackend, RotatingFileBackend,
+                         SinkBackend, UnixSocketBackend)
+
+
+class MemoryBackend(SinkBackend):
+    """Keeps delivered event numbers, failing every batch while down"""
+
+    def __init__(self, up=True):
+        self.up = up
+        self.received = []
+
+    async def send(self, lines):
+        if not self.up:
+            raise ConnectionError("backend down")
+        self.received.extend(json.loads(line)["n"] for line in lines)
+
+
+def make_sink(backend, tmp_path, **options):
+    return EventSink(backend, max_pending=5, batch_size=3, linger=0.01,
+                     spill_file=tmp_path / "spill.jsonl", **options)
+
+
+def test_overflow_is_spilled_and_sent_in_order(tmp_path):
+    async def run():
+        backend = MemoryBackend()
+        sink = make_sink(backend, tmp_path)
+        for n in range(12):
+            assert sink.publish({"n": n})
+        sink.start()
+        while sink.pending or sink.spilled:
+            await asyncio.sleep(0.01)
+        await sink.close()
+        return backend, sink
+
+    backend, sink = asyncio.run(run())
+    assert backend.received == list(range(12))
+    assert sink.stats["spilled"] == 7
+    assert sink.stats["dropped"] == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_undelivered_events_survive_a_restart(tmp_path):
+    async def first_run():
+        sink = make_sink(MemoryBackend(up=False), tmp_path)
+        sink.start()
+        for n in range(8):
+            sink.publish({"n": n})
+        await sink.close(timeout=0.1)
+
+    async def second_run():
+        backend = MemoryBackend()
+        sink = make_sink(backend, tmp_path)
+        assert sink.spilled
+        sink.start()
+        while sink.spilled:
+            await asyncio.sleep(0.01)
+        await sink.close()
+        return backend
+
+    asyncio.run(first_run())
+    backend = asyncio.run(second_run())
+    assert sorted(backend.received) == list(range(8))
+
+
+def test_full_queue_drops_without_spill_file(tmp_path):
+    sink = EventSink(MemoryBackend(), max_pending=2)
+
+    assert sink.publish({"n": 0}) and sink.publish({"n": 1})
+    assert not sink.publish({"n": 2})
+    assert sink.stats["dropped"] == 1
+
+
+def test_unix_socket_backend_streams_json_lines(tmp_path):
+    async def run():
+        received = []
+
+        async def handle(reader, writer):
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received.append(json.loads(line)["n"])
+            writer.close()
+
+        server = await asyncio.start_unix_server(handle, path=str(tmp_path / "sink.sock"))
+        sink = EventSink(UnixSocketBackend(str(tmp_path / "sink.sock")), batch_size=3, linger=0.01)
+        sink.start()
+        for n in range(7):
+            sink.publish({"n": n})
+        await sink.close()
+
+        while len(received) < 7:
+            await asyncio.sleep(0.01)
+        server.close()
+        await server.wait_closed()
+        return received, sink
+
+    received, sink = asyncio.run(run())
+    assert received == list(range(7))
+    assert sink.stats["batches"] == 3
+
+
+@asynccontextmanager
+async def resp_server(fail_streams=()):
+    """Minimal Redis stand-in that answers XADD with a new entry id"""
+    commands = []
+
+    async def read_command(reader):
+        header = await reader.readline()
+        if not header:
+            return None
+        assert header.startswith(b"*")
+        parts = []
+        for _ in range(int(header[1:])):
+            length = int((await reader.readline())[1:])
+            parts.append((await reader.readexactly(length + 2))[:-2])
+        return parts
+
+    async def handle(reader, writer):
+        while True:
+            command = await read_command(reader)
+            if command is None:
+                break
+            if command[0] != b"XADD" or command[1] in fail_streams:
+                writer.write(b"-WRONGTYPE Operation against a key holding the wrong kind of value\r\n")
+            else:
+                commands.append(command)
+                entry_id = b"%d-0" % len(commands)
+                writer.write(b"$%d\r\n%s\r\n" % (len(entry_id), entry_id))
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    try:
+        yield server.sockets[0].getsockname()[1], commands
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def test_redis_backend_adds_each_event_to_the_stream():
+    async def run():
+        async with resp_server() as (port, commands):
+            backend = RedisStreamBackend("127.0.0.1", port, stream="discord:events", maxlen=1000)
+            await backend.send([b'{"n": 0}', b'{"n": 1}'])
+            await backend.send([b'{"n": 2}'])
+            await backend.close()
+        return commands
+
+    commands = asyncio.run(run())
+    assert [command[:6] for command in commands] == [
+        [b"XADD", b"discord:events", b"MAXLEN", b"~", b"1000", b"*"]
+    ] * 3
+    assert [json.loads(command[7])["n"] for command in commands] == [0, 1, 2]
+
+
+def test_redis_backend_raises_error_replies_and_reconnects():
+    async def run():
+        async with resp_server(fail_streams={b"broken"}) as (port, commands):
+            backend = RedisStreamBackend("127.0.0.1", port, stream="broken")
+            with pytest.raises(RedisError, match="WRONGTYPE"):
+                await backend.send([b'{"n": 0}'])
+            assert backend.writer is None
+
+            backend.stream = b"discord:events"
+            await backend.send([b'{"n": 1}'])
+            await backend.close()
+        return commands
+
+    assert len(asyncio.run(run())) == 1
+
+
+def test_file_backend_rotates_and_keeps_newest_files(tmp_path):
+    backend = RotatingFileBackend(tmp_path, max_bytes=100, keep=2)
+    line = lambda n: json.dumps({"n": n, "padding": "x" * 40}).encode()
+
+    async def run():
+        for n in range(7):
+            await backend.send([line(n)])
+
+    asyncio.run(run())
+
+    def numbers(name):
+        return [json.loads(row)["n"] for row in (tmp_path / name).read_text(encoding="utf-8").splitlines()]
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["events.1.jsonl", "events.2.jsonl", "events.jsonl"]
+    assert numbers("events.2.jsonl") == [2, 3]
+    assert numbers("events.1.jsonl") == [4, 5]
+    assert numbers("events.jsonl") == [6]
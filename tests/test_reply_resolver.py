@@ -0,0 +1,93 @@
+"""
+Reply Resolver Tests
+Batched lookups with history pages served from memory
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reply_resolver import ReplyResolver
+
+CHANNEL = SimpleNamespace(id=1)
+
+
+def reply(reply_id, ref_id):
+    return SimpleNamespace(id=reply_id, channel=CHANNEL,
+                           reference=SimpleNamespace(message_id=ref_id, channel_id=CHANNEL.id))
+
+
+def make_resolver(pages, **options):
+    """A resolver whose history reads return (or raise) the given pages in turn"""
+    resolver = ReplyResolver(**options)
+    reads = []
+
+    async def read_window(channel, first_id):
+        reads.append(first_id)
+        page = pages.pop(0)
+        if isinstance(page, Exception):
+            raise page
+        return {message_id: SimpleNamespace(id=message_id) for message_id in page}
+
+    resolver.read_window = read_window
+    return resolver, reads
+
+
+def test_one_lookup_serves_every_callback():
+    resolved = []
+
+    async def first(original, message):
+        resolved.append(("first", original.id, message.id))
+
+    async def second(original, message):
+        resolved.append(("second", original.id, message.id))
+
+    async def run():
+        resolver, reads = make_resolver([[5]])
+        assert resolver.enqueue(reply(9, 5), first)
+        assert resolver.enqueue(reply(9, 5), second)
+        assert resolver.enqueue(reply(9, 5), first)  # Already queued
+        await resolver.flush()
+        return reads
+
+    assert asyncio.run(run()) == [5]
+    assert resolved == [("first", 5, 9), ("second", 5, 9)]
+
+
+def test_transient_error_requeues_unhandled_references():
+    resolved = []
+
+    async def attach(original, message):
+        resolved.append(message.id)
+
+    async def run():
+        # The first page is full, so ref 200 needs a second page, which fails once
+        pages = [list(range(1, 101)), asyncio.TimeoutError(), [200]]
+        resolver, _ = make_resolver(pages, on_resolved=attach)
+        resolver.enqueue(reply(1001, 1))
+        resolver.enqueue(reply(1002, 200))
+        await resolver.flush()
+        assert resolver.pending_count() == 1
+        await resolver.flush()
+        return resolver
+
+    resolver = asyncio.run(run())
+    assert resolved == [1001, 1002]
+    assert resolver.pending_count() == 0
+    assert resolver.stats["dropped"] == 0
+
+
+def test_repeated_errors_drop_and_count():
+    async def run():
+        resolver, _ = make_resolver([ConnectionError()] * 2, max_failures=2)
+        resolver.enqueue(reply(9, 5))
+        await resolver.flush()
+        await resolver.flush()
+        return resolver
+
+    resolver = asyncio.run(run())
+    assert resolver.pending_count() == 0
+    assert resolver.stats["dropped"] == 1
@@ -0,0 +1,131 @@
+"""
+Snapshot Tests
+Copy-on-write stores and the commands bot's point-in-time selections
+"""
+
+import asyncio
+import copy
+import importlib
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from snapshots import CowStore
+
+
+def make_store(count=3):
+    return CowStore((n, {"id": n, "content": f"message {n}", "replies": [{"id": 100 + n, "content": "reply"}]})
+                    for n in range(count))
+
+
+def frozen(snapshot):
+    """A snapshot and a deep copy of it to compare against later"""
+    return snapshot, copy.deepcopy(snapshot)
+
+
+def test_snapshot_ignores_new_records():
+    store = make_store()
+    snapshot, expected = frozen(store.snapshot())
+
+    store[3] = {"id": 3, "content": "new", "replies": []}
+
+    assert snapshot == expected
+    assert 3 in store and 3 not in snapshot
+
+
+def test_snapshot_ignores_writable_changes_including_replies():
+    store = make_store()
+    snapshot, expected = frozen(store.snapshot())
+
+    record = store.writable(0)
+    record["content"] = "edited"
+    record["replies"].append({"id": 200, "content": "another reply"})
+    record["replies"][0]["content"] = "edited reply"
+
+    assert snapshot == expected
+    assert store[0]["content"] == "edited"
+    assert len(store[0]["replies"]) == 2
+    # Copied once per generation, then changed in place
+    assert store.writable(0) is record
+
+
+def test_snapshot_ignores_trim_pop_and_clear():
+    store = make_store(5)
+    snapshot, expected = frozen(store.snapshot())
+
+    dropped = store.trim(3)
+    assert [record["id"] for record in dropped] == [0, 1]
+    assert store.pop(2)["id"] == 2
+    assert list(store) == [3, 4]
+    assert snapshot == expected
+
+    store.clear()
+    assert len(store) == 0
+    assert snapshot == expected
+
+
+def test_each_snapshot_sees_its_own_generation():
+    store = make_store()
+    first, first_expected = frozen(store.snapshot())
+    store.writable(1)["content"] = "second version"
+    second, second_expected = frozen(store.snapshot())
+    store.writable(1)["content"] = "third version"
+
+    assert first == first_expected and second == second_expected
+    assert [s[1]["content"] for s in (first, second, store)] == ["message 1", "second version", "third version"]
+
+
+def test_version_changes_on_writes_only():
+    store = make_store()
+    version = store.version
+
+    store.snapshot()
+    len(store), store.get(0), list(store.items())
+    assert store.version == version
+
+    store.writable(0)
+    assert store.version != version
+    assert CowStore().version != CowStore().version
+
+
+@pytest.fixture
+def commands_bot(tmp_path, monkeypatch):
+    """The commands bot module, with its data folder and collector kept out of the repo"""
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("commands_bot")
+    monkeypatch.setattr(module, "data_collector", module.DataCollector())
+    return module
+
+
+def message_record(message_id, channel="general"):
+    return {"id": message_id, "channel": channel, "content": f"message {message_id}",
+            "timestamp": "2024-01-01T10:00:00", "replies": []}
+
+
+def test_select_is_unchanged_by_later_edits_and_replies(commands_bot):
+    collector = commands_bot.data_collector
+    records = [message_record(n << 22) for n in range(1, 4)]
+    collector.data[1] = CowStore((record["id"], record) for record in records)
+    for record in records:
+        collector.index.add(1, record)
+
+    selected, expected = frozen(collector.select(1))
+    ranged, ranged_expected = frozen(collector.select(1, channel="general"))
+
+    # A reply and an edit arriving while an export reads the selection
+    parsed = {"id": 99 << 22, "guild_id": 1, "reference_id": records[0]["id"], "author": "someone",
+              "content": "a reply", "timestamp": "2024-01-01T10:05:00"}
+    asyncio.run(commands_bot.track_reply(None, parsed))
+    commands_bot.edit_tracker.apply_edit(SimpleNamespace(
+        guild_id=1, message_id=records[1]["id"], data={"content": "edited"}
+    ))
+
+    assert selected == expected
+    assert ranged == ranged_expected
+    current = collector.select(1)
+    assert current[0]["replies"][0]["content"] == "a reply"
+    assert current[1]["content"] == "edited"
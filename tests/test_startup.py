@@ -0,0 +1,56 @@
+"""
+Startup Tests
+Fingerprint-cached command sync with a stand-in command tree
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from startup import sync_commands
+
+
+class FakeTree:
+    """Just enough of app_commands.CommandTree for sync_commands"""
+
+    def __init__(self, names):
+        self.client = SimpleNamespace(application_id=42)
+        self.names = names
+        self.syncs = 0
+
+    def get_commands(self, guild=None):
+        return [SimpleNamespace(to_dict=lambda tree, name=name: {"name": name}) for name in self.names]
+
+    def copy_global_to(self, guild):
+        pass
+
+    async def sync(self, guild=None):
+        self.syncs += 1
+        return self.names
+
+
+def test_sync_skipped_until_commands_change(tmp_path):
+    cache_file = tmp_path / "command_sync.json"
+    tree = FakeTree(["collect", "export"])
+
+    assert asyncio.run(sync_commands(tree, cache_file)) == 2
+    assert asyncio.run(sync_commands(tree, cache_file)) is None
+
+    tree.names = ["collect", "export", "stats"]
+    assert asyncio.run(sync_commands(tree, cache_file)) == 3
+    assert tree.syncs == 2
+    assert not cache_file.with_suffix(".tmp").exists()
+
+
+def test_truncated_cache_is_treated_as_empty(tmp_path):
+    cache_file = tmp_path / "command_sync.json"
+    cache_file.write_text("{", encoding="utf-8")
+    tree = FakeTree(["collect"])
+
+    assert asyncio.run(sync_commands(tree, cache_file)) == 1
+    assert list(json.loads(cache_file.read_text(encoding="utf-8"))) == ["42:global"]
+    assert asyncio.run(sync_commands(tree, cache_file)) is None